@@ -1,12 +1,57 @@
+import argparse
+import hashlib
+import itertools
 import json
+import math
+import multiprocessing
+import sqlite3
+import threading
+import time as timer
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, time, timedelta
-from sentence_transformers import SentenceTransformer
-from sklearn.metrics.pairwise import cosine_similarity
-from tqdm import tqdm
 import os
+from embedding_cache import EmbeddingCache
+from lazy_import import LazyImport
+from metrics import Counter, Histogram
+from ranking import (DEFAULT_PROFILE, PROFILES, candidate_feature_arrays, candidate_features, scorer,
+                     task_urgency, top_k)
+from result_writer import FORMATS, ResultWriter, compact_result
+from skill_matcher import LexicalIndex
 
-# Initialize model
-model = SentenceTransformer("sentence-transformers/all-MiniLM-L6-v2")
+# Heavy libraries are imported on first use, so the CLI's --help and the
+# pure-Python availability helpers don't pay for them
+np = LazyImport('numpy')
+sentence_transformers = LazyImport('sentence_transformers')
+
+MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+
+# Minimum cosine similarity for a task skill to count as a skillset match
+SIMILARITY_THRESHOLD = 0.6
+
+# Proficiency an employee needs in a skill to be considered for it
+MIN_PROFICIENCY = 5
+
+# Day names in datetime.weekday() order, as used in shift keys like 'monday_in'
+DAYS = ['monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday']
+MINUTES_PER_DAY = 24 * 60
+
+STAGE_SECONDS = Histogram('allocator_stage_seconds', 'Time spent in each allocator stage', ['stage'])
+SKILL_MATCHES = Counter('skill_match_total', 'Task skills by the matcher tier that resolved them', ['tier'])
+TASKS_PROCESSED = Counter('allocator_tasks_total', 'Tasks ranked by the allocator', ['outcome'])
+
+# Where skillset embedding matrices are persisted between runs
+EMBEDDING_CACHE_DIR = '.embedding_cache'
+
+# Allocation latency targets (milliseconds) for a warm engine
+LATENCY_TARGET_P50_MS = 250
+LATENCY_TARGET_P99_MS = 1000
+
+# Tasks created through the API only carry a deadline; without one they span a week
+DEFAULT_TASK_SPAN = timedelta(days=7)
+
+# Hours an assigned task is assumed to take when it has no estimate
+DEFAULT_TASK_HOURS = 8
 
 # Skills database
 skillset = [
@@ -16,6 +61,12 @@ skillset = [
     "Laser-Cutting", "Carpentry", "Soldering", "Networking", "Motor-Repair"
 ]
 
+# Exact and near-exact spellings are resolved without the model
+lexical_index = LexicalIndex(skillset)
+
+# Column of each skill in the dense employees x skillset proficiency matrix
+SKILL_COLUMNS = {skill: j for j, skill in enumerate(skillset)}
+
 def load_and_clear_tasks():
     """Load tasks from JSON file and clear it"""
     try:
@@ -33,32 +84,95 @@ def load_and_clear_tasks():
         print(f"Error loading/clearing tasks: {e}")
         return []
 
-def match_to_skillset(task_skills):
+def _normalize_rows(matrix):
+    """L2-normalize embeddings so a dot product is the cosine similarity"""
+    matrix = np.asarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.maximum(norms, 1e-12)
+
+def skillset_fingerprint(model_name, skills):
+    """Cache key for a skillset embedded with a given model"""
+    digest = hashlib.sha1('\n'.join([model_name, *skills]).encode('utf-8'))
+    return digest.hexdigest()[:16]
+
+def load_skillset_embeddings(model, model_name=MODEL_NAME, skills=None, cache_dir=EMBEDDING_CACHE_DIR):
+    """Return the normalized skillset embedding matrix, encoding it only on a cache miss"""
+    skills = list(skillset if skills is None else skills)
+    path = os.path.join(cache_dir, f"skillset_{skillset_fingerprint(model_name, skills)}.npy")
+
+    if os.path.exists(path):
+        try:
+            matrix = np.load(path)
+            if matrix.shape[0] == len(skills):
+                return matrix
+        except (OSError, ValueError) as e:
+            print(f"Ignoring unreadable skillset cache {path}: {e}")
+
+    matrix = _normalize_rows(model.encode(skills))
+
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            np.save(f, matrix)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        print(f"Could not persist skillset embeddings: {e}")
+
+    return matrix
+
+def match_skills_batch(skill_lists, model, skill_matrix, cache=None):
+    """Match several tasks' skills to the skillset.
+
+    Each skill goes through an exact lookup, then trigram similarity, and
+    only skills that miss both are embedded, all in a single encode call.
+    """
+    flat_skills = [skill for task_skills in skill_lists for skill in task_skills]
+    if not flat_skills:
+        return [[] for _ in skill_lists]
+
+    matches = [lexical_index.lookup(skill) for skill in flat_skills]
+    pending = [i for i, match in enumerate(matches) if match is None]
+
+    if pending:
+        # One forward pass for every uncached skill, then one matrix product against the skillset
+        texts = [flat_skills[i] for i in pending]
+        with STAGE_SECONDS.time(stage='skill_encoding'):
+            if cache is not None:
+                embeddings = cache.encode(texts, model)
+            else:
+                embeddings = _normalize_rows(model.encode(texts))
+        similarities = embeddings @ skill_matrix.T
+        best_indices = similarities.argmax(axis=1)
+        best_scores = similarities[np.arange(len(texts)), best_indices]
+        for row, i in enumerate(pending):
+            if best_scores[row] > SIMILARITY_THRESHOLD:
+                matches[i] = (skillset[best_indices[row]], float(f"{best_scores[row]:.4f}"), 'embedding')
+
+    for match in matches:
+        SKILL_MATCHES.inc(tier=match[2] if match else 'unmatched')
+
+    results = []
+    offset = 0
+    for task_skills in skill_lists:
+        matched_skills = []
+        for i, task_skill in enumerate(task_skills, start=offset):
+            if matches[i] is not None:
+                matched_skill, similarity, tier = matches[i]
+                matched_skills.append({
+                    'input_skill': task_skill,
+                    'matched_skill': matched_skill,
+                    'similarity': similarity,
+                    'tier': tier
+                })
+        offset += len(task_skills)
+        results.append(matched_skills)
+
+    return results
+
+def match_to_skillset(task_skills, model, skill_matrix, cache=None):
     """Match task skills to predefined skillset"""
-    matched_skills = []
-    
-    for task_skill in task_skills:
-        highest_similarity = 0
-        best_match = None
-        
-        task_embedding = model.encode([task_skill])[0]
-        
-        for skill in skillset:
-            skill_embedding = model.encode([skill])[0]
-            similarity = cosine_similarity([task_embedding], [skill_embedding])[0][0]
-            
-            if similarity > highest_similarity:
-                highest_similarity = similarity
-                best_match = skill
-        
-        if best_match and highest_similarity > 0.6:
-            matched_skills.append({
-                'input_skill': task_skill,
-                'matched_skill': best_match,
-                'similarity': float(f"{highest_similarity:.4f}")
-            })
-    
-    return matched_skills
+    return match_skills_batch([task_skills], model, skill_matrix, cache)[0]
 
 def load_employees(employees_file):
     """Load employee data from JSON file"""
@@ -69,6 +183,83 @@ def load_employees(employees_file):
         print(f"Error loading {employees_file}: {e}")
         return []
 
+def load_employees_from_db(db_path):
+    """Load employees from the tables written by import_employees.py, or [] if there are none"""
+    conn = sqlite3.connect(db_path)
+    try:
+        employees = {
+            employee_id: {'employee_id': employee_id, 'skills': {}, 'shifts': {}}
+            for (employee_id,) in conn.execute('SELECT employee_id FROM employees ORDER BY employee_id')
+        }
+        for employee_id, skill, proficiency in conn.execute(
+                'SELECT employee_id, skill, proficiency FROM employee_skills'):
+            employees[employee_id]['skills'][skill] = proficiency
+        for employee_id, day, shift_in, shift_out in conn.execute(
+                'SELECT employee_id, day, shift_in, shift_out FROM employee_shifts'):
+            employees[employee_id]['shifts'][f"{day}_in"] = shift_in
+            employees[employee_id]['shifts'][f"{day}_out"] = shift_out
+        return list(employees.values())
+    except sqlite3.OperationalError:
+        # Employee tables haven't been imported into this database
+        return []
+    finally:
+        conn.close()
+
+class EmployeeIndex:
+    """Employees keyed by id plus a skill -> (proficiency, employee_id) inverted index"""
+
+    def __init__(self, employees, min_proficiency=MIN_PROFICIENCY):
+        self.employees = employees
+        self.min_proficiency = min_proficiency
+        self.by_id = {employee['employee_id']: employee for employee in employees}
+        self.rows = {employee['employee_id']: row for row, employee in enumerate(employees)}
+        self.skill_index = build_skill_index(employees, min_proficiency)
+        self.shifts = ShiftTable(employees)
+        self._dense = None
+
+    def __len__(self):
+        return len(self.employees)
+
+    def dense_arrays(self):
+        """(proficiency, id_rank, ids) for rank_batch, built on first use.
+
+        proficiency is employees x skillset with 0 where an employee doesn't
+        qualify, id_rank each row's position in employee id order and ids
+        the employee id of each row.
+        """
+        if self._dense is None:
+            proficiency = np.zeros((len(self.employees), len(skillset)))
+            for skill, entries in self.skill_index.items():
+                column = SKILL_COLUMNS.get(skill)
+                if column is not None:
+                    for prof, employee_id in entries:
+                        proficiency[self.rows[employee_id], column] = prof
+            ids = [employee['employee_id'] for employee in self.employees]
+            id_rank = np.empty(len(ids), dtype=np.int64)
+            id_rank[sorted(range(len(ids)), key=ids.__getitem__)] = np.arange(len(ids))
+            self._dense = (proficiency, id_rank, ids)
+        return self._dense
+
+    def candidates(self, required_skills):
+        """Employees holding at least one required skill, with their qualifying proficiencies"""
+        candidates = {}
+        for skill in dict.fromkeys(required_skills):
+            for prof, employee_id in self.skill_index.get(skill, ()):
+                candidates.setdefault(employee_id, {})[skill] = prof
+        return candidates
+
+def build_skill_index(employees, min_proficiency=MIN_PROFICIENCY):
+    """Map each skill to its qualified employees as (proficiency, employee_id), strongest first"""
+    skill_index = {}
+    for employee in employees:
+        for skill, prof in employee.get('skills', {}).items():
+            if prof >= min_proficiency:
+                skill_index.setdefault(skill, []).append((prof, employee['employee_id']))
+
+    for entries in skill_index.values():
+        entries.sort(key=lambda entry: (-entry[0], entry[1]))
+    return skill_index
+
 def calculate_daily_time_windows(start_time_str, end_time_str):
     """Calculate exact time windows for each day a task spans"""
     try:
@@ -105,353 +296,808 @@ def calculate_daily_time_windows(start_time_str, end_time_str):
         print(f"Invalid time format: {e}")
         return []
 
+def parse_minutes(time_str):
+    """Minutes since midnight for 'HH:MM' or 'HH:MM:SS'; hours past 24 run into the next day"""
+    parts = str(time_str).strip().split(':')
+    if len(parts) not in (2, 3) or not all(p.isdigit() for p in parts):
+        raise ValueError(f"time data '{time_str}' does not match format '%H:%M'")
+    hours, minutes = int(parts[0]), int(parts[1])
+    if minutes >= 60 or hours >= 48:
+        raise ValueError(f"time data '{time_str}' is out of range")
+    return hours * 60 + minutes
+
+def compile_shifts(shifts):
+    """Compile a weekly shift dict into per-day minute intervals.
+
+    Returns (week, scheduled, errors): week[day] is a list of (start, end)
+    minutes on that day, scheduled[day] says whether the day has its own
+    shift, and errors maps day index to a parse error. Shifts ending at or
+    before their start (or past 24:00, like 24:48) continue into the
+    next day instead of being clamped to 23:59.
+    """
+    week = [[] for _ in DAYS]
+    scheduled = [False] * len(DAYS)
+    errors = {}
+
+    for day_index, day in enumerate(DAYS):
+        shift_in = shifts.get(f"{day}_in")
+        shift_out = shifts.get(f"{day}_out")
+        if shift_in is None or shift_out is None:
+            continue
+        scheduled[day_index] = True
+
+        try:
+            start = parse_minutes(shift_in)
+            end = parse_minutes(shift_out)
+        except ValueError as e:
+            errors[day_index] = str(e)
+            continue
+
+        if start >= MINUTES_PER_DAY:
+            start -= MINUTES_PER_DAY
+            end -= MINUTES_PER_DAY
+        if end <= start:
+            end += MINUTES_PER_DAY
+
+        week[day_index].append((start, min(end, MINUTES_PER_DAY)))
+        if end > MINUTES_PER_DAY:
+            week[(day_index + 1) % len(DAYS)].append((0, end - MINUTES_PER_DAY))
+
+    return week, scheduled, errors
+
+def compile_time_windows(time_windows):
+    """Compile calculate_daily_time_windows output into (day_index, start, end) minutes"""
+    compiled = []
+    for window in time_windows:
+        end = parse_minutes(window['end_time'])
+        # Windows are cut at 23:59:59, so 23:59 means the end of the day
+        if end == MINUTES_PER_DAY - 1:
+            end = MINUTES_PER_DAY
+        compiled.append((DAYS.index(window['day_name']), parse_minutes(window['start_time']), end))
+    return compiled
+
+def _overlap_minutes(intervals, window_start, window_end):
+    return sum(max(0, min(end, window_end) - max(start, window_start)) for start, end in intervals)
+
 def check_employee_availability(employee, time_windows):
     """Check if employee is available during required time windows"""
+    week, scheduled, errors = compile_shifts(employee.get('shifts', {}))
     unavailable_periods = []
-    total_available_hours = 0
-    
-    for window in time_windows:
+    total_available_minutes = 0
+
+    for window, (day_index, window_start, window_end) in zip(time_windows, compile_time_windows(time_windows)):
         day = window['day_name']
-        shift_in_key = f"{day}_in"
-        shift_out_key = f"{day}_out"
-        
-        # Check if shift exists for this day
-        if shift_in_key not in employee['shifts'] or shift_out_key not in employee['shifts']:
+
+        if day_index in errors:
             unavailable_periods.append({
                 'day': day,
-                'reason': 'No shift scheduled'
+                'reason': f"Invalid time format: {errors[day_index]}"
             })
             continue
-            
-        shift_in = employee['shifts'][shift_in_key]
-        shift_out = employee['shifts'][shift_out_key]
-        
-        # Skip if shift times are null
-        if shift_in is None or shift_out is None:
+
+        overlap = _overlap_minutes(week[day_index], window_start, window_end)
+        if overlap > 0:
+            total_available_minutes += overlap
+        elif not scheduled[day_index]:
             unavailable_periods.append({
                 'day': day,
                 'reason': 'No shift scheduled'
             })
-            continue
-        
-        try:
-            # Parse times (handle 24:48 as 00:48 next day)
-            def parse_time(time_str):
-                if time_str == '24:00' or time_str == '24:48':  # Handle special cases
-                    return datetime.strptime('23:59', '%H:%M').time()
-                return datetime.strptime(time_str, '%H:%M').time()
-            
-            shift_start = parse_time(shift_in)
-            shift_end = parse_time(shift_out)
-            task_start = datetime.strptime(window['start_time'], '%H:%M').time()
-            task_end = datetime.strptime(window['end_time'], '%H:%M').time()
-            
-            # Only unavailable if ENTIRE shift is before OR after task window
-            if (shift_end < task_start) or (shift_start > task_end):
-                unavailable_periods.append({
-                    'day': day,
-                    'reason': 'Shift completely outside task window',
-                    'shift_hours': f"{shift_in}-{shift_out}",
-                    'task_hours': f"{window['start_time']}-{window['end_time']}"
-                })
-            else:
-                # Calculate overlapping hours
-                overlap_start = max(shift_start, task_start)
-                overlap_end = min(shift_end, task_end)
-                overlap_hours = (datetime.combine(datetime.today(), overlap_end) - 
-                               datetime.combine(datetime.today(), overlap_start)).total_seconds() / 3600
-                total_available_hours += max(0, overlap_hours)
-                
-        except ValueError as e:
+        else:
+            shifts = employee['shifts']
             unavailable_periods.append({
                 'day': day,
-                'reason': f'Invalid time format: {str(e)}'
+                'reason': 'Shift completely outside task window',
+                'shift_hours': f"{shifts[f'{day}_in']}-{shifts[f'{day}_out']}",
+                'task_hours': f"{window['start_time']}-{window['end_time']}"
             })
-    
+
     return {
         'is_available': len(unavailable_periods) == 0,
         'unavailable_periods': unavailable_periods if unavailable_periods else None,
-        'total_available_hours': round(total_available_hours, 2)
-    }    
-    
-    """Check if employee is available during required time windows"""
-    unavailable_periods = []
-    total_available_hours = 0
-    
-    for window in time_windows:
-        day = window['day_name']
-        shift = employee['shifts'].get(day, {})
-        
-        # Skip if no shift scheduled
-        if not shift.get('in') or not shift.get('out'):
-            unavailable_periods.append({
-                'day': day,
-                'reason': 'No shift scheduled'
-            })
-            continue
-        
-        try:
-            shift_start = datetime.strptime(shift['in'], '%H:%M').time()
-            shift_end = datetime.strptime(shift['out'], '%H:%M').time()
-            task_start = datetime.strptime(window['start_time'], '%H:%M').time()
-            task_end = datetime.strptime(window['end_time'], '%H:%M').time()
-            
-            # Only unavailable if ENTIRE shift is before OR after task window
-            if (shift_end < task_start) or (shift_start > task_end):
-                unavailable_periods.append({
-                    'day': day,
-                    'reason': 'Shift completely outside task window',
-                    'shift_hours': f"{shift['in']}-{shift['out']}",
-                    'task_hours': f"{window['start_time']}-{window['end_time']}"
-                })
-            else:
-                # Calculate overlapping hours
-                overlap_start = max(shift_start, task_start)
-                overlap_end = min(shift_end, task_end)
-                overlap_hours = (datetime.combine(datetime.today(), overlap_end) - 
-                               datetime.combine(datetime.today(), overlap_start)).total_seconds() / 3600
-                total_available_hours += max(0, overlap_hours)
-                
-        except ValueError:
-            unavailable_periods.append({
-                'day': day,
-                'reason': 'Invalid time format'
-            })
-    
+        'total_available_hours': round(total_available_minutes / 60, 2)
+    }
+
+class ShiftTable:
+    """Every employee's compiled week as (employees, 7, 2) start/end minute arrays.
+
+    Each day has room for two intervals: its own shift and the part of the
+    previous day's overnight shift that runs into it. Empty slots are (0, 0).
+    """
+
+    def __init__(self, employees):
+        self.starts = np.zeros((len(employees), len(DAYS), 2), dtype=np.int16)
+        self.ends = np.zeros((len(employees), len(DAYS), 2), dtype=np.int16)
+
+        for row, employee in enumerate(employees):
+            week, _, _ = compile_shifts(employee.get('shifts', {}))
+            for day_index, intervals in enumerate(week):
+                for slot, (start, end) in enumerate(intervals):
+                    self.starts[row, day_index, slot] = start
+                    self.ends[row, day_index, slot] = end
+
+    @classmethod
+    def from_arrays(cls, starts, ends):
+        """A table over already compiled arrays, such as a memory-mapped snapshot"""
+        table = cls.__new__(cls)
+        table.starts = starts
+        table.ends = ends
+        return table
+
+    def availability(self, compiled_windows, rows=None):
+        """Available hours and availability flags for many employees at once"""
+        starts = self.starts if rows is None else self.starts[rows]
+        ends = self.ends if rows is None else self.ends[rows]
+        minutes = np.zeros(len(starts), dtype=np.int32)
+        available = np.ones(len(starts), dtype=bool)
+
+        for day_index, window_start, window_end in compiled_windows:
+            overlap = np.clip(
+                np.minimum(ends[:, day_index, :], window_end) - np.maximum(starts[:, day_index, :], window_start),
+                0, None
+            ).sum(axis=1)
+            available &= overlap > 0
+            minutes += overlap
+
+        return minutes / 60, available
+
+def top_candidates_entry(task_result, k=5):
+    """Top k available candidates of one task result, in the order it was ranked"""
+    available_employees = []
+    for emp in task_result['matching_employees']:
+        if len(available_employees) == k or not emp['availability']['is_available']:
+            break
+        available_employees.append({
+            'employee_id': emp['employee_id'],
+            'skill_sum': emp['skill_sum'],
+            'score': emp['score'],
+            'matched_skills': emp['matched_skills'],
+            'availability': emp['availability']
+        })
+
+    if not available_employees:
+        return None
     return {
-        'is_available': len(unavailable_periods) == 0,
-        'unavailable_periods': unavailable_periods if unavailable_periods else None,
-        'total_available_hours': round(total_available_hours, 2)
+        'task_id': task_result['task_id'],
+        'task_name': task_result['task_name'],
+        'required_skills': task_result['required_skills'],
+        'top_candidates': available_employees
     }
-    """Check if employee is available during required time windows"""
-    unavailable_periods = []
-    total_available_hours = 0
-    
-    for window in time_windows:
-        day = window['day_name']
-        shift = employee['shifts'].get(day, {})
-        
-        if not shift.get('in') or not shift.get('out'):
-            unavailable_periods.append({
-                'day': day,
-                'reason': 'No shift scheduled'
-            })
-            continue
-        
+
+
+def allocate_task(task, employee_index, model, skill_matrix, cache=None, **ranking):
+    """Rank employees for a single task, or return None if it can't be allocated"""
+    if not task.get('skillsRequired'):
+        return None
+
+    matched_skills = match_to_skillset(task['skillsRequired'], model, skill_matrix, cache)
+    return rank_task(task, matched_skills, employee_index, **ranking)
+
+
+# Employee index of an allocation worker process, inherited on fork or sent once on spawn
+_worker_index = None
+
+# Chunks per worker; more than one keeps workers busy when some tasks rank slower
+CHUNKS_PER_WORKER = 4
+
+
+def _init_worker(employee_index):
+    global _worker_index
+    if employee_index is not None:
+        _worker_index = employee_index
+
+
+def _rank_chunk(chunk, ranking):
+    return list(rank_batch(chunk, _worker_index, **ranking))
+
+
+def rank_parallel(pairs, employee_index, workers, **ranking):
+    """Yield rank_batch results for (task, matched_skills) pairs from a process pool, in input order.
+
+    With fork the workers inherit the employee index copy-on-write, so it
+    is never pickled; with spawn it is sent once per worker, not per task.
+    """
+    global _worker_index
+    if 'fork' in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context('fork')
+        # Built before forking so workers share the dense arrays instead of each building them
+        employee_index.dense_arrays()
+        _worker_index = employee_index
+        initargs = (None,)
+    else:
+        context = multiprocessing.get_context('spawn')
+        initargs = (employee_index,)
+
+    size = max(1, math.ceil(len(pairs) / (workers * CHUNKS_PER_WORKER)))
+    chunks = [pairs[i:i + size] for i in range(0, len(pairs), size)]
+    try:
+        with ProcessPoolExecutor(workers, mp_context=context, initializer=_init_worker,
+                                 initargs=initargs) as pool:
+            # map returns chunks in submission order, so the merge is deterministic
+            for results in pool.map(_rank_chunk, chunks, itertools.repeat(ranking)):
+                yield from results
+    finally:
+        _worker_index = None
+
+
+def iter_allocations(tasks, employee_index, model, skill_matrix, cache=None, workers=1, **ranking):
+    """Yield task results one at a time, encoding all of the tasks' skills in one batch.
+
+    With workers > 1 tasks are ranked in a process pool; results keep the
+    task order either way. ranking is passed through to rank_batch (k,
+    profile, workload, committed_hours).
+    """
+    tasks = [task for task in tasks if task.get('skillsRequired')]
+    matched = match_skills_batch([task['skillsRequired'] for task in tasks], model, skill_matrix, cache)
+
+    pairs = list(zip(tasks, matched))
+    if workers > 1 and len(pairs) > 1:
+        results = rank_parallel(pairs, employee_index, workers, **ranking)
+    else:
+        results = rank_batch(pairs, employee_index, **ranking)
+
+    for task_result in results:
+        if task_result is not None:
+            yield task_result
+
+
+def _prepare_task(task, matched_skills):
+    """Required skills and daily time windows of a task, or None (counted by outcome) if it can't be ranked"""
+    if not matched_skills:
+        TASKS_PROCESSED.inc(outcome='no_skill_match')
+        return None
+
+    required_skills = [m['matched_skill'] for m in matched_skills]
+
+    # Calculate task time windows
+    time_windows = calculate_daily_time_windows(
+        task['startTime'],
+        task['endTime']
+    )
+    if not time_windows:
+        TASKS_PROCESSED.inc(outcome='invalid_time_range')
+        return None
+    return required_skills, time_windows
+
+
+def _ranked_employee(employee, matched_skills, skill_sum, score, hours_available, is_available, on_shift,
+                     time_windows, committed_hours):
+    """One entry of a task result's matching_employees"""
+    if is_available:
+        availability = {
+            'is_available': True,
+            'unavailable_periods': None,
+            'total_available_hours': round(hours_available, 2)
+        }
+    elif on_shift:
+        availability = {
+            'is_available': False,
+            'unavailable_periods': [{
+                'reason': 'Shift hours already committed to assigned tasks',
+                'committed_hours': round(committed_hours[str(employee['employee_id'])], 2)
+            }],
+            'total_available_hours': 0.0
+        }
+    else:
+        # Only unavailable employees that made the cut need the per-day explanation
+        availability = check_employee_availability(employee, time_windows)
+    return {
+        'employee_id': employee['employee_id'],
+        'skills': employee.get('skills', {}),
+        'matched_skills': matched_skills,
+        'shifts': employee['shifts'],
+        'availability': availability,
+        'skill_sum': skill_sum,
+        'score': round(score, 4)
+    }
+
+
+def _task_result(task, time_windows, required_skills, matching_employees):
+    TASKS_PROCESSED.inc(outcome='allocated')
+    return {
+        'task_id': task.get('id'),
+        'task_name': task.get('taskName'),
+        'time_windows': time_windows,
+        'required_skills': required_skills,
+        'matching_employees': matching_employees,
+        'best_candidates': [
+            emp for emp in matching_employees[:3]
+            if emp['availability']['is_available']
+        ]  # Top 3 available candidates; available employees rank first
+    }
+
+
+def rank_task(task, matched_skills, employee_index, k=None, profile=DEFAULT_PROFILE, workload=None,
+              committed_hours=None):
+    """Rank employees for a task whose skills are already matched to the skillset.
+
+    Keeps the k best candidates (all when k is None) under the scoring
+    profile; workload maps employee ids (as strings, like load_workload
+    returns them) to their open task counts and committed_hours to the
+    hours of work already assigned to them, which come off the hours
+    their shifts give this task.
+    """
+    prepared = _prepare_task(task, matched_skills)
+    if prepared is None:
+        return None
+    required_skills, time_windows = prepared
+
+    # Find matching employees through the skill index and check all their shifts at once
+    with STAGE_SECONDS.time(stage='availability'):
+        candidates = employee_index.candidates(required_skills)
+        hours, available = employee_index.shifts.availability(
+            compile_time_windows(time_windows),
+            [employee_index.rows[employee_id] for employee_id in candidates]
+        )
+        on_shift = available
+        if committed_hours:
+            hours = np.maximum(hours - [committed_hours.get(str(employee_id), 0) for employee_id in candidates], 0)
+            available = on_shift & (hours > 0)
+
+    ranking_started = timer.perf_counter()
+    score = scorer(profile)
+    workload = workload or {}
+    task_hours = sum(window['duration_hours'] for window in time_windows)
+    urgency = task_urgency(time_windows)
+
+    # Score every candidate once, then keep the best k: available first, then by score
+    scored = []
+    for i, (employee_id, common_skills) in enumerate(candidates.items()):
+        skill_sum = sum(common_skills.values())
+        hours_available = float(hours[i])
+        features = candidate_features(skill_sum, hours_available, len(required_skills), task_hours,
+                                      workload.get(str(employee_id), 0), urgency)
+        scored.append((bool(available[i]), score(features), skill_sum, hours_available, i))
+    selected = top_k(scored, k, key=lambda entry: entry[:4])
+
+    matching_employees = []
+    candidate_ids = list(candidates)
+    for is_available, candidate_score, skill_sum, hours_available, i in selected:
+        employee_id = candidate_ids[i]
+        matching_employees.append(_ranked_employee(
+            employee_index.by_id[employee_id], candidates[employee_id], skill_sum, candidate_score,
+            hours_available, is_available, on_shift[i], time_windows, committed_hours
+        ))
+
+    STAGE_SECONDS.observe(timer.perf_counter() - ranking_started, stage='ranking')
+    return _task_result(task, time_windows, required_skills, matching_employees)
+
+
+def _top_rows(rows, available, scores, k):
+    """Rows that can make a top k ordered by availability, then score: the best k plus ties with the k-th"""
+    keep = []
+    for group in (rows[available[rows]], rows[~available[rows]]):
+        if k <= 0:
+            break
+        if len(group) > k:
+            group_scores = scores[group]
+            kth = np.partition(group_scores, len(group) - k)[len(group) - k]
+            group = group[group_scores >= kth]
+        keep.append(group)
+        k -= len(group)
+    return np.concatenate(keep) if keep else rows[:0]
+
+
+# Task-employee pairs scored at once by rank_batch; bounds the memory of its matrices
+DENSE_CHUNK_CELLS = 2 ** 20
+
+
+def rank_batch(pairs, employee_index, k=None, profile=DEFAULT_PROFILE, workload=None, committed_hours=None):
+    """rank_task for many (task, matched_skills) pairs, scoring every task-employee pair with array operations.
+
+    A chunk of tasks becomes a one-hot tasks x skillset matrix, so skill
+    sums, eligibility, available hours and scores are tasks x employees
+    matrices; Python objects are built only for each task's top k. Yields
+    the same results as rank_task, ties included, in input order. A
+    callable profile scores one features dict at a time, so it goes
+    through rank_task.
+    """
+    if callable(profile):
+        for task, matched_skills in pairs:
+            yield rank_task(task, matched_skills, employee_index, k, profile, workload, committed_hours)
+        return
+
+    score = scorer(profile)
+    proficiency, id_rank, ids = employee_index.dense_arrays()
+    qualified = (proficiency > 0).astype(np.float64)
+    workload = workload or {}
+    open_tasks = np.array([workload.get(str(employee_id), 0) for employee_id in ids], dtype=np.float64)
+    committed = np.array([(committed_hours or {}).get(str(employee_id), 0) for employee_id in ids],
+                         dtype=np.float64)
+
+    chunk_size = max(1, DENSE_CHUNK_CELLS // max(1, len(ids)))
+    for chunk_start in range(0, len(pairs), chunk_size):
+        chunk = pairs[chunk_start:chunk_start + chunk_size]
+        prepared = [_prepare_task(task, matched_skills) for task, matched_skills in chunk]
+        ranked = [(task, *entry) for (task, _), entry in zip(chunk, prepared) if entry is not None]
+
+        if ranked:
+            with STAGE_SECONDS.time(stage='availability'):
+                onehot = np.zeros((len(ranked), len(skillset)))
+                for t, (_, required_skills, _) in enumerate(ranked):
+                    onehot[t, [SKILL_COLUMNS[skill] for skill in required_skills]] = 1
+                skill_sums = onehot @ proficiency.T
+                eligible = (onehot @ qualified.T) > 0
+
+                hours = np.empty((len(ranked), len(ids)))
+                on_shift = np.empty((len(ranked), len(ids)), dtype=bool)
+                for t, (_, _, time_windows) in enumerate(ranked):
+                    hours[t], on_shift[t] = employee_index.shifts.availability(compile_time_windows(time_windows))
+                available = on_shift
+                if committed_hours:
+                    hours = np.maximum(hours - committed, 0)
+                    available = on_shift & (hours > 0)
+
+            ranking_started = timer.perf_counter()
+            task_hours = np.array([[sum(window['duration_hours'] for window in time_windows)]
+                                   for _, _, time_windows in ranked])
+            required_counts = np.array([[len(required_skills)] for _, required_skills, _ in ranked])
+            urgency = np.array([[task_urgency(time_windows)] for _, _, time_windows in ranked])
+            scores = score(candidate_feature_arrays(skill_sums, hours, required_counts, task_hours,
+                                                    open_tasks, urgency))
+            matrices = skill_sums, eligible, hours, on_shift, available, scores
+            ranking_seconds = timer.perf_counter() - ranking_started
+
+        t = 0
+        for entry in prepared:
+            if entry is None:
+                yield None
+                continue
+            started = timer.perf_counter()
+            result = _select_top(ranked[t], t, matrices, employee_index, proficiency, id_rank, ids, k,
+                                 committed_hours)
+            ranking_seconds += timer.perf_counter() - started
+            t += 1
+            yield result
+        if ranked:
+            STAGE_SECONDS.observe(ranking_seconds, stage='ranking')
+
+
+def _select_top(ranked_task, t, matrices, employee_index, proficiency, id_rank, ids, k, committed_hours):
+    """Task result for row t of rank_batch's matrices, ordered like rank_task"""
+    task, required_skills, time_windows = ranked_task
+    skill_sums, eligible, hours, on_shift, available, scores = matrices
+
+    rows = np.nonzero(eligible[t])[0]
+    if k is not None and len(rows) > k:
+        rows = _top_rows(rows, available[t], scores[t], k)
+
+    # rank_task breaks ties by candidate order: the first required skill held, its proficiency, then id
+    columns = np.array([SKILL_COLUMNS[skill] for skill in dict.fromkeys(required_skills)])
+    first = (proficiency[rows][:, columns] > 0).argmax(axis=1)
+    first_prof = proficiency[rows, columns[first]]
+    order = np.lexsort((id_rank[rows], -first_prof, first, -hours[t, rows], -skill_sums[t, rows],
+                        -scores[t, rows], ~available[t, rows]))
+    rows = rows[order][:k]
+
+    # Python values for the selected rows only, converted in bulk
+    skills = list(dict.fromkeys(required_skills))
+    selected = zip(rows.tolist(), (proficiency[rows][:, columns] > 0).tolist(), scores[t, rows].tolist(),
+                   hours[t, rows].tolist(), available[t, rows].tolist(), on_shift[t, rows].tolist())
+    matching_employees = []
+    for row, holds, candidate_score, hours_available, is_available, is_on_shift in selected:
+        employee = employee_index.by_id[ids[row]]
+        matched = {skill: employee['skills'][skill] for skill, held in zip(skills, holds) if held}
+        matching_employees.append(_ranked_employee(
+            employee, matched, sum(matched.values()), candidate_score, hours_available,
+            is_available, is_on_shift, time_windows, committed_hours
+        ))
+    return _task_result(task, time_windows, required_skills, matching_employees)
+
+
+def load_unassigned_tasks(conn, project_id=None):
+    """Unassigned tasks of a project (or of every project) from tasks.db, in the API's task format"""
+    if project_id is None:
+        cursor = conn.execute('SELECT id, title, skills, deadline FROM tasks WHERE assigned_to IS NULL')
+    else:
+        cursor = conn.execute(
+            'SELECT id, title, skills, deadline FROM tasks WHERE project_id = ? AND assigned_to IS NULL',
+            (project_id,)
+        )
+    return [
+        {
+            'id': task_id,
+            'title': title,
+            'skills': json.loads(skills) if skills else [],
+            'deadline': deadline
+        }
+        for task_id, title, skills, deadline in cursor
+    ]
+
+
+def load_workload(conn, today=None):
+    """Open assigned tasks and committed hours per employee, in one aggregate query.
+
+    Tasks whose deadline has passed no longer count. Employee ids are
+    strings whatever type the employee data uses. Returns the keyword
+    arguments rank_task takes for them.
+    """
+    today = (today or datetime.now()).strftime('%Y-%m-%d')
+    try:
+        rows = conn.execute('''
+        SELECT assigned_to, COUNT(*), SUM(COALESCE(hours, ?))
+        FROM tasks
+        WHERE assigned_to IS NOT NULL AND (deadline IS NULL OR deadline >= ?)
+        GROUP BY assigned_to
+        ''', (DEFAULT_TASK_HOURS, today)).fetchall()
+    except sqlite3.OperationalError as e:
+        print(f"Could not load employee workload: {e}")
+        rows = []
+    return {
+        'workload': {str(employee_id): count for employee_id, count, _ in rows},
+        'committed_hours': {str(employee_id): hours for employee_id, _, hours in rows}
+    }
+
+
+def task_from_api(task, now=None):
+    """Convert a task as stored by app.py into the allocator's task format, or None if its deadline is invalid"""
+    start = (now or datetime.now()).replace(second=0, microsecond=0)
+    deadline = task.get('deadline')
+    if deadline:
         try:
-            shift_start = datetime.strptime(shift['in'], '%H:%M').time()
-            shift_end = datetime.strptime(shift['out'], '%H:%M').time()
-            task_start = datetime.strptime(window['start_time'], '%H:%M').time()
-            task_end = datetime.strptime(window['end_time'], '%H:%M').time()
-            
-            if task_start >= shift_start and task_end <= shift_end:
-                total_available_hours += window['duration_hours']
-            else:
-                unavailable_periods.append({
-                    'day': day,
-                    'required': f"{window['start_time']}-{window['end_time']}",
-                    'available': f"{shift['in']}-{shift['out']}",
-                    'reason': 'Outside shift hours'
-                })
-        except ValueError:
-            unavailable_periods.append({
-                'day': day,
-                'reason': 'Invalid time format'
-            })
-    
+            end = datetime.combine(datetime.strptime(deadline, '%Y-%m-%d').date(), time(23, 59))
+        except (TypeError, ValueError):
+            print(f"Skipping task {task.get('id', task.get('task_id'))}: deadline {deadline!r} is not YYYY-MM-DD")
+            return None
+    else:
+        end = start + DEFAULT_TASK_SPAN
+
     return {
-        'is_available': len(unavailable_periods) == 0,
-        'unavailable_periods': unavailable_periods if unavailable_periods else None,
-        'total_available_hours': total_available_hours
+        'id': task.get('id', task.get('task_id')),
+        'taskName': task.get('title'),
+        'skillsRequired': task.get('skills', []),
+        'startTime': start.strftime('%Y:%m:%d:%H:%M'),
+        'endTime': end.strftime('%Y:%m:%d:%H:%M')
     }
 
-def generate_top_candidates(all_results, output_file='top_candidates.json'):
-    """Generate a file with top 5 available candidates sorted by skill ranking"""
-    top_candidates = []
-    
-    for task_result in all_results:
-        task_id = task_result['task_id']
-        task_name = task_result['task_name']
-        required_skills = task_result['required_skills']
-        
-        # Get available employees and calculate their skill sums
-        available_employees = []
-        for emp in task_result.get('matching_employees', []):
-            if emp.get('availability', {}).get('is_available', False):
-                # Sum rankings for matched skills
-                skill_sum = sum(emp.get('matched_skills', {}).values())
-                available_employees.append({
-                    **emp,
-                    'skill_sum': skill_sum,
-                    'task_id': task_id,
-                    'task_name': task_name
-                })
-        
-        # Sort by skill sum (descending) and take top 5
-        available_employees.sort(key=lambda x: x.get('skill_sum', 0), reverse=True)
-        top_5 = available_employees[:5]
-        
-        if top_5:
-            top_candidates.append({
-                'task_id': task_id,
-                'task_name': task_name,
-                'required_skills': required_skills,
-                'top_candidates': top_5
-            })
-    
-    # Save to file
-    with open(output_file, 'w') as f:
-        json.dump(top_candidates, f, indent=2)
-    
-    print(f"Top candidates saved to {output_file}")
-    return top_candidates
-    """Generate a file with top 5 available candidates sorted by skill ranking"""
-    top_candidates = []
-    
-    for task_result in all_results:
-        task_id = task_result['task_id']
-        task_name = task_result['task_name']
-        required_skills = task_result['required_skills']
-        
-        # Get available employees and calculate their skill sums
-        available_employees = []
-        for emp in task_result['matching_employees']:
-            if emp['availability']['is_available']:
-                # Sum rankings for matched skills
-                skill_sum = sum(emp['matched_skills'].values())
-                available_employees.append({
-                    **emp,
-                    'skill_sum': skill_sum,
-                    'task_id': task_id,
-                    'task_name': task_name
-                })
-        
-        # Sort by skill sum (descending) and take top 5
-        available_employees.sort(key=lambda x: x['skill_sum'], reverse=True)
-        top_5 = available_employees[:5]
-        
-        if top_5:
-            top_candidates.append({
-                'task_id': task_id,
-                'task_name': task_name,
-                'required_skills': required_skills,
-                'top_candidates': top_5
-            })
-    
-    # Save to file
-    with open(output_file, 'w') as f:
-        json.dump(top_candidates, f, indent=2)
-    
-    print(f"Top candidates saved to {output_file}")
-    return top_candidates
-
-
-def main():
-    # Load and clear tasks
-    tasks = load_and_clear_tasks()
-    if not tasks:
-        print("No tasks found in tasks.json")
+
+def tasks_from_api(tasks, now=None):
+    """task_from_api for many tasks, leaving out the ones that can't be converted"""
+    converted = (task_from_api(task, now) for task in tasks)
+    return [task for task in converted if task is not None]
+
+
+class AllocatorEngine:
+    """Keeps the model and employee data loaded between allocations"""
+
+    def __init__(self, employees_file='employees_data.json', model_name=MODEL_NAME, model=None,
+                 cache_dir=EMBEDDING_CACHE_DIR, db_path=None, snapshot_path=None):
+        self.employees_file = employees_file
+        self.db_path = db_path
+        self.snapshot_path = snapshot_path
+        self.model_name = model_name
+        self.model = model
+        self.cache_dir = cache_dir
+        self.skill_matrix = None
+        self.embedding_cache = None
+        self.employees = EmployeeIndex([])
+        self.warmed = False
+        self._lock = threading.Lock()
+        self._latencies_ms = deque(maxlen=1000)
+
+    def warm_up(self):
+        """Load the model, skillset embeddings and employees so the first request is fast"""
+        with self._lock:
+            if self.model is None:
+                with STAGE_SECONDS.time(stage='model_load'):
+                    self.model = sentence_transformers.SentenceTransformer(self.model_name)
+            with STAGE_SECONDS.time(stage='skillset_embeddings'):
+                self.skill_matrix = load_skillset_embeddings(self.model, self.model_name,
+                                                             cache_dir=self.cache_dir)
+            if self.embedding_cache is None:
+                self.embedding_cache = EmbeddingCache(
+                    self.model_name, os.path.join(self.cache_dir, 'embeddings.db'))
+            self.employees = self._open_employees()
+        # Skillset entries match lexically, so run the model directly to warm it
+        self.model.encode(skillset[:1])
+        self.warmed = True
+        return self
+
+    def _load_employees(self):
+        """Employees from the database tables when imported, else from the JSON file"""
+        with STAGE_SECONDS.time(stage='employee_load'):
+            return self._read_employees()
+
+    def _read_employees(self):
+        if self.db_path:
+            employees = load_employees_from_db(self.db_path)
+            if employees:
+                return employees
+        return load_employees(self.employees_file)
+
+    def _open_employees(self):
+        """Index over the employee snapshot when one is configured, compiling it if it is out of date.
+
+        import_employees.py rewrites the snapshot after importing into the
+        database; an employee file edited after the snapshot was written, a
+        missing snapshot or one in an older format are compiled here.
+        """
+        if not self.snapshot_path:
+            return EmployeeIndex(self._load_employees())
+        from employee_snapshot import SnapshotIndex, write_snapshot
+        if os.path.exists(self.snapshot_path):
+            outdated = (os.path.exists(self.employees_file)
+                        and os.path.getmtime(self.employees_file) > os.path.getmtime(self.snapshot_path))
+            if not outdated:
+                try:
+                    return SnapshotIndex(self.snapshot_path)
+                except ValueError as e:
+                    print(f"Recompiling employee snapshot: {e}")
+        write_snapshot(self._load_employees(), self.snapshot_path)
+        return SnapshotIndex(self.snapshot_path)
+
+    def _check_snapshot(self):
+        """Map the snapshot again if another process has swapped in a new one"""
+        if self.snapshot_path and hasattr(self.employees, 'is_stale') and self.employees.is_stale():
+            from employee_snapshot import SnapshotIndex
+            employees = SnapshotIndex(self.snapshot_path)
+            with self._lock:
+                self.employees = employees
+
+    def reload_employees(self):
+        """Re-read employee data and rebuild the index without reloading the model"""
+        if self.snapshot_path:
+            from employee_snapshot import SnapshotIndex, employees_digest, write_snapshot
+            employees = self._load_employees()
+            # Only swap the file when the data changed, so other processes keep their mapping
+            if getattr(self.employees, 'version', None) != employees_digest(employees).hex():
+                write_snapshot(employees, self.snapshot_path)
+            employees = SnapshotIndex(self.snapshot_path)
+        else:
+            employees = EmployeeIndex(self._load_employees())
+        with self._lock:
+            self.employees = employees
+        return len(employees)
+
+    def allocate(self, task, **ranking):
+        """Allocate a task in the allocator's format and record the latency"""
+        if not self.warmed:
+            self.warm_up()
+        self._check_snapshot()
+
+        started = timer.perf_counter()
+        result = allocate_task(task, self.employees, self.model, self.skill_matrix,
+                               self.embedding_cache, **ranking)
+        elapsed_ms = (timer.perf_counter() - started) * 1000
+        self._latencies_ms.append(elapsed_ms)
+
+        if elapsed_ms > LATENCY_TARGET_P99_MS:
+            print(f"Allocation for task {task.get('id')} took {elapsed_ms:.0f}ms "
+                  f"(p99 target {LATENCY_TARGET_P99_MS}ms)")
+        return result
+
+    def iter_batch(self, tasks, **ranking):
+        """Allocate many tasks in one pass, yielding each result as soon as it is ranked"""
+        if not self.warmed:
+            self.warm_up()
+        self._check_snapshot()
+
+        yield from iter_allocations(tasks, self.employees, self.model, self.skill_matrix,
+                                    self.embedding_cache, **ranking)
+
+    def allocate_batch(self, tasks, **ranking):
+        """Allocate many tasks in one pass over the loaded model and employees"""
+        return list(self.iter_batch(tasks, **ranking))
+
+    def latency_stats(self):
+        """p50/p99 allocation latency over the most recent allocations"""
+        samples = sorted(self._latencies_ms)
+
+        def percentile(p):
+            if not samples:
+                return None
+            return round(samples[min(len(samples) - 1, int(len(samples) * p))], 2)
+
+        return {
+            'count': len(samples),
+            'p50_ms': percentile(0.50),
+            'p99_ms': percentile(0.99),
+            'target_p50_ms': LATENCY_TARGET_P50_MS,
+            'target_p99_ms': LATENCY_TARGET_P99_MS,
+            'employees_loaded': len(self.employees),
+            'embedding_cache': self.embedding_cache.stats() if self.embedding_cache else None
+        }
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Rank employees for tasks by skills and shift availability')
+    parser.add_argument('--project', type=int,
+                        help='allocate every unassigned task of this project in the database instead of tasks.json')
+    parser.add_argument('--db', default='tasks.db',
+                        help='SQLite database with projects and imported employees')
+    parser.add_argument('--employees', default='employees_data.json',
+                        help='employee data file, used when the database has no employees')
+    parser.add_argument('--global', dest='global_mode', action='store_true',
+                        help='assign tasks jointly so no employee is booked beyond their shift hours')
+    parser.add_argument('--format', choices=FORMATS, default='json',
+                        help='json writes a compact array, ndjson one task result per line')
+    parser.add_argument('--top-k', type=int,
+                        help='keep only the k best matching employees per task')
+    parser.add_argument('--snapshot',
+                        help='employee snapshot file to memory-map, compiled from the employee data if missing')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='rank tasks in this many processes (0 for one per CPU core)')
+    parser.add_argument('--profile', choices=PROFILES, default=DEFAULT_PROFILE,
+                        help='how candidates are scored: proficiency, available hours, workload, '
+                             'deadline or a balanced mix')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.top_k is not None and args.top_k < 1:
+        print("--top-k must be at least 1")
         return
 
-    # Load employees data
-    employees = load_employees('employees_data.json')
-    if not employees:
+    if args.project is not None:
+        conn = sqlite3.connect(args.db)
+        try:
+            tasks = tasks_from_api(load_unassigned_tasks(conn, args.project))
+        finally:
+            conn.close()
+        if not tasks:
+            print(f"No unassigned tasks found for project {args.project}")
+            return
+    else:
+        # Load and clear tasks
+        tasks = load_and_clear_tasks()
+        if not tasks:
+            print("No tasks found in tasks.json")
+            return
+
+    # Load employees data and model once for the whole run
+    engine = AllocatorEngine(employees_file=args.employees, db_path=args.db,
+                             snapshot_path=args.snapshot).warm_up()
+    if not engine.employees:
         print("No employees data loaded")
         return
 
-    all_results = []
-    
-    for task in tasks:
-        if not task.get('skillsRequired'):
-            continue
-            
-        print(f"\nProcessing Task {task.get('id')}: {task.get('taskName')}")
-        
-        # Match skills to skillset
-        matched_skills = match_to_skillset(task['skillsRequired'])
-        if not matched_skills:
-            print("No matching skills found in skillset")
-            continue
-        
-        required_skills = [m['matched_skill'] for m in matched_skills]
-        
-        # Calculate task time windows
-        time_windows = calculate_daily_time_windows(
-            task['startTime'], 
-            task['endTime']
-        )
-        if not time_windows:
-            print("Invalid task time range")
-            continue
-        
-        # Find matching employees
-        matching_employees = []
-        for employee in employees:
-            employee_skills = employee.get('skills', {})
-            common_skills = {
-                skill: prof for skill, prof in employee_skills.items()
-                if skill in required_skills and prof >= 5
-            }
-            
-            if common_skills:
-                availability = check_employee_availability(employee, time_windows)
-                matching_employees.append({
-                    'employee_id': employee['employee_id'],
-                    'skills': employee_skills,
-                    'matched_skills': common_skills,
-                    'shifts': employee['shifts'],
-                    'availability': availability
-                })
-        
-        # Sort by availability and proficiency
-        matching_employees.sort(
-            key=lambda x: (
-                x['availability']['is_available'],
-                sum(x['matched_skills'].values()),
-                x['availability']['total_available_hours']
-            ),
-            reverse=True
-        )
-        
-        # Store results
-        task_result = {
-            'task_id': task.get('id'),
-            'task_name': task.get('taskName'),
-            'time_windows': time_windows,
-            'required_skills': required_skills,
-            'matching_employees': matching_employees,
-            'best_candidates': [
-                emp for emp in matching_employees 
-                if emp['availability']['is_available']
-            ][:3]  # Top 3 available candidates
-        }
-        all_results.append(task_result)
-    
-    # Save results
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    output_file = f'task_allocations_{timestamp}.json'
-    with open(output_file, 'w') as f:
-        json.dump(all_results, f, indent=2)
-    
-    print(f"\nAllocation complete. Results saved to {output_file}")
+    workers = args.workers or os.cpu_count() or 1
+    ranking = {'k': args.top_k, 'profile': args.profile, 'workers': workers}
+    if os.path.exists(args.db):
+        # Hours already assigned in the database come off everyone's availability
+        conn = sqlite3.connect(args.db)
+        try:
+            ranking.update(load_workload(conn))
+        finally:
+            conn.close()
 
+    started = timer.perf_counter()
+    if args.global_mode:
+        # Joint assignment needs every result before anything can be written
+        from assignment import assign_globally
+        results = engine.allocate_batch(tasks, **ranking)
+        assign_globally(results, engine.employees)
+    else:
+        results = engine.iter_batch(tasks, **ranking)
+
+    # Results are written as they are ranked; employees are referred to by id
+    allocated = []
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    output_file = f'task_allocations_{timestamp}.json'
-    
-    # Save complete results
-    with open(output_file, 'w') as f:
-        json.dump(all_results, f, indent=2)
-    
+    output_file = f'task_allocations_{timestamp}.{args.format}'
+    top_candidates_file = f'top_candidates_{timestamp}.{args.format}'
+    with ResultWriter(output_file, args.format) as allocations, \
+            ResultWriter(top_candidates_file, args.format) as top_candidates:
+        for result in results:
+            allocations.write(compact_result(result))
+            entry = top_candidates_entry(result)
+            if entry:
+                top_candidates.write(entry)
+            allocated.append(result['task_id'])
+            available = sum(emp['availability']['is_available'] for emp in result['matching_employees'])
+            print(f"Task {result['task_id']}: {result['task_name']} - {available} available candidates")
+
+    allocated_ids = set(allocated)
+    for task in tasks:
+        if task.get('id') not in allocated_ids:
+            print(f"Task {task.get('id')}: {task.get('taskName')} - not allocated "
+                  f"(no skills matched the skillset or invalid time range)")
+    elapsed_ms = (timer.perf_counter() - started) * 1000
+    print(f"Allocated {len(allocated)}/{len(tasks)} tasks in {elapsed_ms:.0f}ms")
     print(f"\nAllocation complete. Results saved to {output_file}")
-    
-    # Generate top candidates file
-    top_candidates_file = f'top_candidates_{timestamp}.json'
-    generate_top_candidates(all_results, top_candidates_file)
-    # Add this at the end of your main() function, before saving results:
-    top_candidates = generate_top_candidates(all_results)
-
-# This will create a new file 'top_candidates.json' with structure:
-# [
+    print(f"Top candidates saved to {top_candidates_file}")
+
+# Each top candidates record has the structure:
 #   {
 #     "task_id": 1,
 #     "task_name": "Task Name",
@@ -461,14 +1107,11 @@ def main():
 #         "employee_id": "E001",
 #         "skill_sum": 17,
 #         "matched_skills": {"Skill1": 8, "Skill2": 9},
-#         "availability": {...},
-#         ...
+#         "availability": {...}
 #       },
 #       ... (top 5)
 #     ]
-#   },
-#   ... (all tasks)
-# ]
+#   }
 
 if __name__ == '__main__':
     main()
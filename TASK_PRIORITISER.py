@@ -0,0 +1,344 @@
+import bisect
+import json
+import sys
+import threading
+from datetime import date, datetime
+
+from TASK_ALLOCATOR import lexical_index
+
+# Weights of the three priority factors; each factor is scaled to 0..1
+DEADLINE_WEIGHT = 0.5
+SCARCITY_WEIGHT = 0.3
+DEPENDENCY_WEIGHT = 0.2
+
+# Deadlines further out than this add nothing to a task's urgency
+DEADLINE_HORIZON_DAYS = 14
+
+
+def create_priority_tables(conn):
+    """Dependency and version tables; expects allocation_state's tables to exist already"""
+    # task_id can't start before depends_on is assigned
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS task_dependencies (
+        task_id INTEGER NOT NULL,
+        depends_on INTEGER NOT NULL,
+        PRIMARY KEY (task_id, depends_on),
+        FOREIGN KEY (task_id) REFERENCES tasks (id),
+        FOREIGN KEY (depends_on) REFERENCES tasks (id)
+    ) WITHOUT ROWID
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_task_dependencies_depends_on ON task_dependencies (depends_on)')
+
+    # Bumped on every task write, so a process can tell its cached queue is out of date.
+    # Dependencies are only written together with their task, which bumps it too.
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS project_versions (
+        project_id INTEGER PRIMARY KEY,
+        version INTEGER NOT NULL
+    )
+    ''')
+    for event, row in (('INSERT', 'NEW'), ('UPDATE', 'NEW'), ('DELETE', 'OLD')):
+        conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS tasks_{event.lower()}_version AFTER {event} ON tasks
+        BEGIN
+            INSERT INTO project_versions (project_id, version) VALUES ({row}.project_id, 1)
+            ON CONFLICT (project_id) DO UPDATE SET version = version + 1;
+        END
+        ''')
+    # A new allocation resolves the task's skills, which its scarcity is based on
+    conn.execute('''
+    CREATE TRIGGER IF NOT EXISTS allocation_inputs_insert_version AFTER INSERT ON allocation_inputs
+    BEGIN
+        INSERT INTO project_versions (project_id, version)
+        SELECT project_id, 1 FROM tasks WHERE id = NEW.task_id
+        ON CONFLICT (project_id) DO UPDATE SET version = version + 1;
+    END
+    ''')
+
+
+# Skillset entries the allocator resolved a task's skills to, through every matcher tier.
+# An empty result (no time left before the deadline, say) doesn't record them.
+RESOLVED_SKILLS = '''
+(SELECT a.required_skills FROM allocation_inputs a JOIN task_allocations r ON r.task_id = a.task_id
+ WHERE a.task_id = t.id AND r.result != '{}')
+'''
+
+
+def project_version(conn, project_id):
+    row = conn.execute('SELECT version FROM project_versions WHERE project_id = ?', (project_id,)).fetchone()
+    return row[0] if row else 0
+
+
+def check_dependencies(conn, project_id, depends_on, task_id=None):
+    """Error message when depends_on isn't a list of other tasks in the same project, else None"""
+    if not isinstance(depends_on, list) or not all(isinstance(d, int) for d in depends_on):
+        return 'dependsOn must be a list of task ids'
+    if task_id is not None and task_id in depends_on:
+        return 'A task cannot depend on itself'
+    if not depends_on:
+        return None
+    ids = set(depends_on)
+    placeholders = ','.join('?' * len(ids))
+    found = {row[0] for row in conn.execute(
+        f"SELECT id FROM tasks WHERE project_id = ? AND id IN ({placeholders})", [project_id, *ids])}
+    missing = sorted(ids - found)
+    if missing:
+        return f"Unknown tasks in this project: {', '.join(map(str, missing))}"
+    if task_id is not None and depends_on_reaches(conn, ids, task_id):
+        return 'Dependencies would form a cycle'
+    return None
+
+
+def depends_on_reaches(conn, ids, task_id):
+    """True if task_id is among ids or the tasks they depend on, directly or transitively"""
+    placeholders = ','.join(['(?)'] * len(ids))
+    return conn.execute(f'''
+    WITH RECURSIVE upstream(id) AS (
+        VALUES {placeholders}
+        UNION
+        SELECT d.depends_on FROM task_dependencies d JOIN upstream u ON d.task_id = u.id
+    )
+    SELECT 1 FROM upstream WHERE id = ? LIMIT 1
+    ''', [*ids, task_id]).fetchone() is not None
+
+
+def save_dependencies(conn, task_id, depends_on):
+    """Replace the tasks task_id depends on"""
+    conn.execute('DELETE FROM task_dependencies WHERE task_id = ?', (task_id,))
+    conn.executemany('INSERT INTO task_dependencies (task_id, depends_on) VALUES (?, ?)',
+                     [(task_id, d) for d in dict.fromkeys(depends_on)])
+
+
+def deadline_urgency(deadline, today):
+    """1.0 for a task due today or overdue, falling to 0 at the horizon; 0 without a deadline"""
+    if not deadline:
+        return 0.0
+    try:
+        due = datetime.strptime(deadline, '%Y-%m-%d').date()
+    except ValueError:
+        return 0.0
+    days_left = (due - today).days
+    return max(0.0, min(1.0, 1 - days_left / DEADLINE_HORIZON_DAYS))
+
+
+def skill_scarcity(skills, skill_counts, total_employees, required_skills=None):
+    """How hard the task's rarest skill is to staff: 1.0 when nobody qualifies, 0 when everyone does.
+
+    required_skills are the skillset entries the allocator matched skills
+    to, one per skill it could match; without them skills are looked up
+    lexically. A skill that matches nothing can't be staffed, so it counts
+    as 1.0.
+    """
+    if not total_employees:
+        return 0.0
+    if required_skills is None:
+        matches = [lexical_index.lookup(skill) for skill in skills]
+        required_skills = [match[0] for match in matches if match is not None]
+    if len(required_skills) < len(skills):
+        return 1.0
+    scarcity = 0.0
+    for skill in required_skills:
+        qualified = skill_counts.get(skill, 0)
+        scarcity = max(scarcity, 1 - qualified / total_employees)
+    return scarcity
+
+
+class ProjectQueue:
+    """Open tasks of one project kept in priority order.
+
+    Entries are (blocked, -score, task_id) in a sorted list, so a change to
+    one task only moves that task and its direct dependency neighbours.
+    A task is blocked while any task it depends on is still unassigned.
+    """
+
+    def __init__(self, skill_counts, total_employees, today):
+        self.skill_counts = skill_counts
+        self.total_employees = total_employees
+        self.today = today
+        self.version = None
+        self.tasks = {}
+        self.required_skills = {}
+        self.prereqs = {}
+        self.dependents = {}
+        self.priority = {}
+        self._keys = {}
+        self._order = []
+
+    def build(self, tasks, dependencies, required_skills=None):
+        """Load tasks (API format plus assigned_to) and (task_id, depends_on) pairs.
+
+        required_skills maps task ids to the skillset entries their last
+        allocation matched; other tasks' skills are looked up lexically.
+        """
+        for task in tasks:
+            self.tasks[task['id']] = task
+        self.required_skills.update(required_skills or {})
+        for task_id, depends_on in dependencies:
+            self.prereqs.setdefault(task_id, set()).add(depends_on)
+            self.dependents.setdefault(depends_on, set()).add(task_id)
+        for task_id in self.tasks:
+            self._score(task_id)
+        self._order = sorted(self._keys.values())
+        return self
+
+    def _is_open(self, task_id):
+        task = self.tasks.get(task_id)
+        return task is not None and task.get('assigned_to') is None
+
+    def _score(self, task_id):
+        """Recompute one task's priority and sort key; assigned tasks leave the queue"""
+        if not self._is_open(task_id):
+            self.priority.pop(task_id, None)
+            return self._keys.pop(task_id, None), None
+
+        task = self.tasks[task_id]
+        open_dependents = sum(1 for d in self.dependents.get(task_id, ()) if self._is_open(d))
+        blocked_by = sorted(p for p in self.prereqs.get(task_id, ()) if self._is_open(p))
+        factors = {
+            'deadline': round(deadline_urgency(task.get('deadline'), self.today), 4),
+            'scarcity': round(skill_scarcity(task.get('skills', []), self.skill_counts, self.total_employees,
+                                             self.required_skills.get(task_id)), 4),
+            'dependents': round(open_dependents / (1 + open_dependents), 4)
+        }
+        score = (DEADLINE_WEIGHT * factors['deadline'] + SCARCITY_WEIGHT * factors['scarcity']
+                 + DEPENDENCY_WEIGHT * factors['dependents'])
+        self.priority[task_id] = {'score': round(score, 4), 'factors': factors, 'blockedBy': blocked_by}
+
+        old = self._keys.get(task_id)
+        self._keys[task_id] = (bool(blocked_by), -score, task_id)
+        return old, self._keys[task_id]
+
+    def _reposition(self, task_id):
+        old, new = self._score(task_id)
+        if old == new:
+            return
+        if old is not None:
+            del self._order[bisect.bisect_left(self._order, old)]
+        if new is not None:
+            bisect.insort(self._order, new)
+
+    def update(self, task, prereqs, required_skills=None):
+        """Add or replace one task and the tasks it depends on, then reorder the affected tasks"""
+        task_id = task['id']
+        if required_skills is None:
+            self.required_skills.pop(task_id, None)
+        else:
+            self.required_skills[task_id] = required_skills
+        dropped = self.prereqs.get(task_id, set()) - set(prereqs)
+        for previous in dropped:
+            self.dependents.get(previous, set()).discard(task_id)
+        self.prereqs[task_id] = set(prereqs)
+        for depends_on in prereqs:
+            self.dependents.setdefault(depends_on, set()).add(task_id)
+        self.tasks[task_id] = task
+
+        # Assigning or changing a task changes its neighbours' blocked state and dependent counts
+        affected = {task_id} | dropped | self.prereqs[task_id] | self.dependents.get(task_id, set())
+        for affected_id in affected:
+            self._reposition(affected_id)
+
+    def ranked(self):
+        return [
+            {**self.tasks[task_id], 'priority': self.priority[task_id]}
+            for _, _, task_id in self._order
+        ]
+
+
+class PriorityEngine:
+    """Per-project priority queues, built on first use and then updated incrementally"""
+
+    def __init__(self):
+        self.skill_counts = {}
+        self.total_employees = 0
+        self._queues = {}
+        self._lock = threading.Lock()
+
+    def set_workforce(self, employee_index):
+        """Skill scarcity comes from the allocator's employee index; queues rebuild lazily"""
+        with self._lock:
+            self.skill_counts = {skill: len(entries) for skill, entries in employee_index.skill_index.items()}
+            self.total_employees = len(employee_index)
+            self._queues.clear()
+
+    def invalidate(self, project_id):
+        """Drop a project's queue after a bulk change; it is rebuilt on the next GET"""
+        with self._lock:
+            self._queues.pop(project_id, None)
+
+    def _queue(self, conn, project_id):
+        queue = self._queues.get(project_id)
+        today = date.today()
+        version = project_version(conn, project_id)
+        if queue is None or queue.today != today or queue.version != version:
+            # Deadline urgency moves once a day, so a new day rebuilds the queue,
+            # and so does a task written by another process since it was built
+            tasks = []
+            required_skills = {}
+            for task_id, title, description, skills, deadline, assigned_to, resolved in conn.execute(
+                    f'SELECT id, title, description, skills, deadline, assigned_to, {RESOLVED_SKILLS} '
+                    'FROM tasks t WHERE project_id = ?', (project_id,)):
+                tasks.append({'id': task_id, 'title': title, 'description': description,
+                              'skills': json.loads(skills) if skills else [], 'deadline': deadline,
+                              'assigned_to': assigned_to})
+                if resolved is not None:
+                    required_skills[task_id] = json.loads(resolved)
+            dependencies = conn.execute('''
+            SELECT d.task_id, d.depends_on FROM task_dependencies d
+            JOIN tasks t ON t.id = d.task_id
+            WHERE t.project_id = ?
+            ''', (project_id,)).fetchall()
+            queue = ProjectQueue(self.skill_counts, self.total_employees, today).build(
+                tasks, dependencies, required_skills)
+            queue.version = version
+            self._queues[project_id] = queue
+        return queue
+
+    def ranked(self, conn, project_id):
+        """Open tasks of a project, highest priority first"""
+        with self._lock:
+            return self._queue(conn, project_id).ranked()
+
+    def task_changed(self, conn, task_id):
+        """Re-read one task after it was created, edited, allocated or assigned and move it in its project's queue"""
+        row = conn.execute(
+            f'SELECT project_id, title, description, skills, deadline, assigned_to, {RESOLVED_SKILLS} '
+            'FROM tasks t WHERE id = ?',
+            (task_id,)
+        ).fetchone()
+        if row is None:
+            return
+        project_id, title, description, skills, deadline, assigned_to, resolved = row
+        prereqs = [depends_on for (depends_on,) in conn.execute(
+            'SELECT depends_on FROM task_dependencies WHERE task_id = ?', (task_id,))]
+        version = project_version(conn, project_id)
+        with self._lock:
+            queue = self._queues.get(project_id)
+            if queue is None:
+                return  # Built from the database on its first GET
+            if version != queue.version + 1:
+                # Someone else wrote to the project too; rebuild on the next GET
+                del self._queues[project_id]
+                return
+            queue.version = version
+            queue.update({
+                'id': task_id, 'title': title, 'description': description,
+                'skills': json.loads(skills) if skills else [], 'deadline': deadline,
+                'assigned_to': assigned_to
+            }, prereqs, json.loads(resolved) if resolved is not None else None)
+
+
+def main():
+    """Read {"tasks": [...]} on stdin and print them in priority order.
+
+    Tasks may list the ids they depend on under "dependsOn". Without
+    employee data every skill counts as equally available.
+    """
+    payload = json.load(sys.stdin)
+    tasks = [{**task, 'assigned_to': task.get('assigned_to')} for task in payload.get('tasks', [])]
+    dependencies = [(task['id'], depends_on) for task in tasks for depends_on in task.get('dependsOn', [])]
+    queue = ProjectQueue({}, 0, date.today()).build(tasks, dependencies)
+    json.dump(queue.ranked(), sys.stdout)
+
+
+if __name__ == '__main__':
+    main()
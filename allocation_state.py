@@ -0,0 +1,267 @@
+import hashlib
+import json
+from datetime import datetime
+
+from ranking import DEFAULT_TOP_K
+from result_writer import compact_result
+
+from TASK_ALLOCATOR import DAYS, calculate_daily_time_windows, load_workload, task_from_api, tasks_from_api
+
+
+def create_state_tables(conn):
+    # Latest allocation result for each task
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS task_allocations (
+        task_id INTEGER PRIMARY KEY,
+        result TEXT,
+        updated_at TEXT,
+        FOREIGN KEY (task_id) REFERENCES tasks (id)
+    )
+    ''')
+    # What each stored result was computed from
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS allocation_inputs (
+        task_id INTEGER PRIMARY KEY,
+        task_fingerprint TEXT NOT NULL,
+        required_skills TEXT NOT NULL,
+        weekdays TEXT NOT NULL,
+        window_start TEXT
+    )
+    ''')
+    # Results cover a window that starts on the day they were computed; added after the first release
+    columns = {row[1] for row in conn.execute('PRAGMA table_info(allocation_inputs)')}
+    if 'window_start' not in columns:
+        conn.execute('ALTER TABLE allocation_inputs ADD COLUMN window_start TEXT')
+    # Employee skills and shifts as of the last refresh
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS employee_snapshots (
+        employee_id TEXT PRIMARY KEY,
+        skills TEXT NOT NULL,
+        shifts TEXT NOT NULL
+    )
+    ''')
+    # Open tasks and committed hours per employee as of the last refresh
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS workload_snapshots (
+        employee_id TEXT PRIMARY KEY,
+        open_tasks INTEGER NOT NULL,
+        committed_hours REAL NOT NULL
+    )
+    ''')
+
+
+def task_fingerprint(task):
+    """Hash of the API task fields that affect its allocation"""
+    inputs = json.dumps([task.get('skills', []), task.get('deadline')], sort_keys=True)
+    return hashlib.sha1(inputs.encode('utf-8')).hexdigest()
+
+
+def task_weekdays(allocator_task):
+    if allocator_task is None:
+        return []
+    windows = calculate_daily_time_windows(allocator_task['startTime'], allocator_task['endTime'])
+    return sorted({DAYS.index(window['day_name']) for window in windows})
+
+
+def window_start(now=None):
+    """Date an allocation's time window starts on; task_from_api starts every window at now"""
+    return (now or datetime.now()).strftime('%Y-%m-%d')
+
+
+def save_allocation(conn, task, result, now=None):
+    """Store an API task's allocation result, compacted, with the inputs it depends on.
+
+    now is when the result was computed, which is where its time window
+    starts.
+    """
+    conn.execute(
+        'INSERT OR REPLACE INTO task_allocations (task_id, result, updated_at) VALUES (?, ?, ?)',
+        (task['id'], json.dumps(compact_result(result) if result else {}),
+         datetime.now().isoformat(timespec='seconds'))
+    )
+    conn.execute(
+        'INSERT OR REPLACE INTO allocation_inputs '
+        '(task_id, task_fingerprint, required_skills, weekdays, window_start) VALUES (?, ?, ?, ?, ?)',
+        (
+            task['id'],
+            task_fingerprint(task),
+            json.dumps((result or {}).get('required_skills', [])),
+            json.dumps(task_weekdays(task_from_api(task, now))),
+            window_start(now)
+        )
+    )
+
+
+def employee_changes(conn, employees):
+    """Skills and weekdays that changed for each employee since the last refresh.
+
+    Returns {employee_id: (changed_skills, held_skills, changed_days)} where
+    held_skills are all skills the employee had before or has now. Ids are
+    strings, as stored in employee_snapshots.
+    """
+    previous = {
+        employee_id: (json.loads(skills), json.loads(shifts))
+        for employee_id, skills, shifts in conn.execute(
+            'SELECT employee_id, skills, shifts FROM employee_snapshots')
+    }
+
+    changes = {}
+    current_ids = set()
+    for employee in employees:
+        employee_id = str(employee['employee_id'])
+        current_ids.add(employee_id)
+        old_skills, old_shifts = previous.get(employee_id, ({}, {}))
+        new_skills, new_shifts = employee.get('skills', {}), employee.get('shifts', {})
+
+        changed_skills = {
+            skill for skill in set(old_skills) | set(new_skills)
+            if old_skills.get(skill) != new_skills.get(skill)
+        }
+        changed_days = set()
+        for day_index, day in enumerate(DAYS):
+            for edge in ('in', 'out'):
+                key = f"{day}_{edge}"
+                if old_shifts.get(key) != new_shifts.get(key):
+                    # An overnight shift also reaches into the next day
+                    changed_days.update({day_index, (day_index + 1) % len(DAYS)})
+
+        if changed_skills or changed_days:
+            changes[employee_id] = (changed_skills, set(old_skills) | set(new_skills), changed_days)
+
+    # Employees who left affect every task they could have been matched to
+    for employee_id in set(previous) - current_ids:
+        old_skills = set(previous[employee_id][0])
+        changes[employee_id] = (old_skills, old_skills, set(range(len(DAYS))))
+
+    return changes
+
+
+def save_employee_snapshots(conn, employees, changed_ids):
+    conn.executemany(
+        'INSERT OR REPLACE INTO employee_snapshots (employee_id, skills, shifts) VALUES (?, ?, ?)',
+        [
+            (str(employee['employee_id']), json.dumps(employee.get('skills', {})),
+             json.dumps(employee.get('shifts', {})))
+            for employee in employees if str(employee['employee_id']) in changed_ids
+        ]
+    )
+    current_ids = {str(employee['employee_id']) for employee in employees}
+    conn.executemany(
+        'DELETE FROM employee_snapshots WHERE employee_id = ?',
+        [(employee_id,) for employee_id in changed_ids if employee_id not in current_ids]
+    )
+
+
+def workload_changes(conn, employees, workload, changes):
+    """Add employees whose open tasks or committed hours changed since the last refresh to changes.
+
+    Their hours drop or free up on every day, so each counts as a change
+    on all days for every skill they hold. Returns the current workload
+    rows keyed by employee id, for save_workload_snapshots.
+    """
+    previous = {
+        employee_id: (open_tasks, committed_hours)
+        for employee_id, open_tasks, committed_hours in conn.execute(
+            'SELECT employee_id, open_tasks, committed_hours FROM workload_snapshots')
+    }
+    current = {
+        employee_id: (workload['workload'][employee_id], workload['committed_hours'][employee_id])
+        for employee_id in workload['workload']
+    }
+    skills = {str(employee['employee_id']): set(employee.get('skills', {})) for employee in employees}
+    for employee_id in set(previous) | set(current):
+        if previous.get(employee_id) == current.get(employee_id):
+            continue
+        held = skills.get(employee_id, set())
+        changed_skills, held_skills, _ = changes.get(employee_id, (set(), set(), set()))
+        changes[employee_id] = (changed_skills, held_skills | held, set(range(len(DAYS))))
+    return current
+
+
+def save_workload_snapshots(conn, current):
+    conn.execute('DELETE FROM workload_snapshots')
+    conn.executemany(
+        'INSERT INTO workload_snapshots (employee_id, open_tasks, committed_hours) VALUES (?, ?, ?)',
+        [(employee_id, open_tasks, committed_hours) for employee_id, (open_tasks, committed_hours) in current.items()]
+    )
+
+
+def stale_task_ids(conn, tasks, changes, now=None):
+    """Tasks whose inputs changed, whose time window has moved on since, or that depend on a changed employee"""
+    stored = {}
+    for task_id, fingerprint, required_skills, weekdays, start in conn.execute(
+            'SELECT task_id, task_fingerprint, required_skills, weekdays, window_start FROM allocation_inputs'):
+        stored[task_id] = (fingerprint, set(json.loads(required_skills)), set(json.loads(weekdays)), start)
+
+    today = window_start(now)
+    stale = []
+    for task in tasks:
+        inputs = stored.get(task['id'])
+        if inputs is None or inputs[0] != task_fingerprint(task) or inputs[3] != today:
+            stale.append(task['id'])
+            continue
+
+        _, required_skills, weekdays, _ = inputs
+        for changed_skills, held_skills, changed_days in changes.values():
+            if (changed_skills & required_skills) or (held_skills & required_skills and changed_days & weekdays):
+                stale.append(task['id'])
+                break
+    return stale
+
+
+def _summary(result):
+    """The part of a full or compact result callers care about when deciding whether it changed"""
+    result = result or {}
+    hours = {
+        candidate['employee_id']: candidate['availability']['total_available_hours']
+        for candidate in result.get('matching_employees', [])
+    }
+    best = [candidate['employee_id'] if isinstance(candidate, dict) else candidate
+            for candidate in result.get('best_candidates', [])]
+    return [(employee_id, hours.get(employee_id)) for employee_id in best]
+
+
+def refresh_allocations(conn, engine, tasks, all_tasks=True, now=None):
+    """Recompute only the allocations whose tasks or employees changed.
+
+    tasks are API-format tasks. Employee and workload snapshots are only
+    advanced when all_tasks is set, so a partial refresh never hides an
+    employee change from tasks it didn't look at. Results computed on an
+    earlier day are recomputed too, since their time windows start at the
+    time of allocation. Returns the ids that were recomputed and the new
+    results whose best candidates differ from the stored ones.
+    """
+    now = now or datetime.now()
+    employees = engine.employees.employees
+    workload = load_workload(conn, now)
+    changes = employee_changes(conn, employees)
+    # Assigning a task changes its assignee's committed hours, and with them their rankings
+    current_workload = workload_changes(conn, employees, workload, changes)
+    stale_ids = set(stale_task_ids(conn, tasks, changes, now))
+    stale_tasks = [task for task in tasks if task['id'] in stale_ids]
+
+    previous = {}
+    if stale_ids:
+        placeholders = ','.join('?' * len(stale_ids))
+        previous = {
+            task_id: json.loads(result) if result else {}
+            for task_id, result in conn.execute(
+                f"SELECT task_id, result FROM task_allocations WHERE task_id IN ({placeholders})",
+                list(stale_ids))
+        }
+
+    results = {result['task_id']: result
+               for result in engine.allocate_batch(tasks_from_api(stale_tasks, now), k=DEFAULT_TOP_K, **workload)}
+
+    changed = []
+    with conn:
+        for task in stale_tasks:
+            result = results.get(task['id'], {})
+            if task['id'] not in previous or _summary(previous[task['id']]) != _summary(result):
+                changed.append(compact_result(result) if result else {'task_id': task['id']})
+            save_allocation(conn, task, result, now)
+        if all_tasks:
+            save_employee_snapshots(conn, employees, set(changes))
+            save_workload_snapshots(conn, current_workload)
+
+    return {'recomputed': sorted(stale_ids), 'changed': changed}
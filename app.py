@@ -1,71 +1,381 @@
 
-from flask import Flask, request, jsonify
+from flask import Flask, Response, g, request, jsonify, stream_with_context
 from flask_cors import CORS
 import json
-import sqlite3
-import subprocess
 import os
+import re
+import threading
+import time
+from datetime import datetime
+from allocation_state import create_state_tables, refresh_allocations, save_allocation
+from assignment import assign_globally
+from db import ConnectionPool
+from jobs import JobQueue
+from metrics import Gauge, Histogram, render
+from ranking import DEFAULT_PROFILE, DEFAULT_TOP_K, PROFILES
+from result_writer import compact_result
+from TASK_PRIORITISER import PriorityEngine, check_dependencies, create_priority_tables, save_dependencies
+from TASK_ALLOCATOR import AllocatorEngine, load_unassigned_tasks, load_workload, task_from_api, tasks_from_api
 
 app = Flask(__name__)
-CORS(app)  # Enable CORS for all routes
+# Enable CORS for all routes; paginated lists report their total in X-Total-Count
+CORS(app, expose_headers=['X-Total-Count'])
+
+# Allocator stays loaded for the lifetime of the server
+# Worker processes share one memory-mapped employee snapshot
+allocator = AllocatorEngine(db_path='tasks.db', snapshot_path='employees.snapshot')
+
+# Page size for list endpoints
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+# Columns GET /api/projects/<id>/tasks can return
+TASK_FIELDS = ('id', 'title', 'description', 'skills', 'deadline', 'hours')
+
+# Rows accepted by one POST /api/projects/<id>/tasks:bulk
+MAX_BULK_ROWS = 5000
+
+DEADLINE_FORMAT = re.compile(r'^\d{4}-\d{2}-\d{2}$')
+
+# Connections are reused across requests instead of opened per route
+pool = ConnectionPool('tasks.db')
+
+def get_db():
+    """Pooled connection for the current request, returned on teardown"""
+    if 'db' not in g:
+        g.db = pool.acquire()
+    return g.db
+
+@app.teardown_appcontext
+def release_db(exception):
+    conn = g.pop('db', None)
+    if conn is not None:
+        pool.release(conn)
 
 # Initialize database
 def init_db():
-    conn = sqlite3.connect('tasks.db')
-    cursor = conn.cursor()
-    
-    # Create projects table
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS projects (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        name TEXT NOT NULL,
-        description TEXT
-    )
-    ''')
-    
-    # Create tasks table
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS tasks (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        project_id INTEGER,
-        title TEXT NOT NULL,
-        description TEXT,
-        skills TEXT,
-        deadline TEXT,
-        assigned_to INTEGER DEFAULT NULL,
-        FOREIGN KEY (project_id) REFERENCES projects (id)
-    )
-    ''')
-    
-    conn.commit()
-    conn.close()
+    with pool.connection() as conn:
+        cursor = conn.cursor()
+
+        # Create projects table
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS projects (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            description TEXT
+        )
+        ''')
+
+        # Create tasks table
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS tasks (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            project_id INTEGER,
+            title TEXT NOT NULL,
+            description TEXT,
+            skills TEXT,
+            deadline TEXT,
+            hours REAL,
+            assigned_to INTEGER DEFAULT NULL,
+            FOREIGN KEY (project_id) REFERENCES projects (id)
+        )
+        ''')
+
+        # Estimated effort, added after the first release
+        columns = {row[1] for row in cursor.execute('PRAGMA table_info(tasks)')}
+        if 'hours' not in columns:
+            cursor.execute('ALTER TABLE tasks ADD COLUMN hours REAL')
+
+        # Allocation results and the inputs they were computed from
+        create_state_tables(conn)
+
+        # Which tasks have to be assigned before others
+        create_priority_tables(conn)
+
+        # Project pages filter by project, workload lookups by assignee
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_tasks_project_id ON tasks (project_id)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_tasks_assigned_to ON tasks (assigned_to)')
+
+        conn.commit()
+
+def run_task_allocation(payload, progress):
+    """Job handler: allocate one task and save the result against it.
+
+    The full result is read from GET /api/tasks/<id>/allocation; the job
+    only records the best candidates instead of a second copy.
+    """
+    now = datetime.now()
+    with pool.connection() as conn:
+        workload = load_workload(conn, now)
+    allocator_task = task_from_api(payload, now)
+    allocation = {}
+    if allocator_task:
+        allocation = allocator.allocate(allocator_task, k=DEFAULT_TOP_K, **workload) or {}
+    progress(0.9)
+    with pool.connection() as conn:
+        save_allocation(conn, payload, allocation, now)
+        conn.commit()
+        # Its skills are now resolved through every matcher tier, which its scarcity uses
+        priorities.task_changed(conn, payload['id'])
+    return {
+        'taskId': payload['id'],
+        'allocated': bool(allocation),
+        'bestCandidates': [candidate['employee_id'] for candidate in allocation.get('best_candidates', [])]
+    }
+
+def run_batch_allocation(payload, progress):
+    """Job handler: allocate many tasks in one batch and save every result"""
+    tasks = payload['tasks']
+    now = datetime.now()
+    with pool.connection() as conn:
+        workload = load_workload(conn, now)
+    allocations = {allocation['task_id']: allocation
+                   for allocation in allocator.allocate_batch(tasks_from_api(tasks, now), k=DEFAULT_TOP_K,
+                                                              **workload)}
+    progress(0.8)
+    with pool.connection() as conn:
+        with conn:
+            for task in tasks:
+                save_allocation(conn, task, allocations.get(task['id'], {}), now)
+    return {
+        'allocated': len(allocations),
+        'unallocated': [task['id'] for task in tasks if task['id'] not in allocations]
+    }
+
+def valid_deadline(deadline):
+    """True for None or a real YYYY-MM-DD date"""
+    if deadline is None:
+        return True
+    if not isinstance(deadline, str) or not DEADLINE_FORMAT.match(deadline):
+        return False
+    try:
+        datetime.strptime(deadline, '%Y-%m-%d')
+    except ValueError:
+        return False
+    return True
+
+def is_row_ref(value):
+    """{"row": n} refers to row n of the same bulk upload"""
+    return (isinstance(value, dict) and set(value) == {'row'} and isinstance(value['row'], int)
+            and not isinstance(value['row'], bool) and value['row'] >= 1)
 
-# Initialize database at startup
-init_db()
+def validate_task_row(row, allow_row_refs=False):
+    """(task fields, None) for a valid new task or bulk row, or (None, error message)
+
+    With allow_row_refs, dependsOn may also hold {"row": n} references to
+    other rows of a bulk upload; they are returned under rowRefs.
+    """
+    if not isinstance(row, dict):
+        return None, 'Row must be a JSON object'
+    title = row.get('title')
+    if not isinstance(title, str) or not title.strip():
+        return None, 'title is required'
+    skills = row.get('skills', [])
+    if not isinstance(skills, list) or not all(isinstance(skill, str) for skill in skills):
+        return None, 'skills must be a list of strings'
+    deadline = row.get('deadline')
+    if not valid_deadline(deadline):
+        return None, 'deadline must be YYYY-MM-DD'
+    hours = row.get('hours')
+    if hours is not None and (isinstance(hours, bool) or not isinstance(hours, (int, float)) or hours < 0):
+        return None, 'hours must be a non-negative number'
+    depends_on = row.get('dependsOn', [])
+    if not isinstance(depends_on, list):
+        return None, 'dependsOn must be a list of task ids'
+    row_refs = [d['row'] for d in depends_on if allow_row_refs and is_row_ref(d)]
+    depends_on = [d for d in depends_on if not (allow_row_refs and is_row_ref(d))]
+    if not all(isinstance(d, int) and not isinstance(d, bool) for d in depends_on):
+        return None, ('dependsOn must be a list of task ids or {"row": n}' if allow_row_refs
+                      else 'dependsOn must be a list of task ids')
+    description = row.get('description')
+    if description is not None and not isinstance(description, str):
+        return None, 'description must be a string'
+    return {
+        'title': title, 'description': description, 'skills': skills,
+        'deadline': deadline, 'hours': hours, 'dependsOn': depends_on, 'rowRefs': row_refs
+    }, None
+
+def check_row_refs(valid):
+    """Split valid bulk rows into those whose row references can be resolved and (row number, error)
+
+    A row can't be created if it refers to a row that isn't created, or
+    if its references lead back to itself.
+    """
+    rows = dict(valid)
+    dependents = {}
+    for row_number, row in rows.items():
+        for ref in set(row['rowRefs']):
+            dependents.setdefault(ref, []).append(row_number)
+
+    # Rows referring to rejected rows are rejected too, and so on down the chain
+    errors = {}
+    stack = []
+    for row_number, row in rows.items():
+        missing = sorted(ref for ref in set(row['rowRefs']) if ref not in rows)
+        if missing:
+            errors[row_number] = f"Depends on rows that were not created: {', '.join(map(str, missing))}"
+            stack.append(row_number)
+    while stack:
+        for dependent in dependents.get(stack.pop(), ()):
+            if dependent not in errors:
+                errors[dependent] = 'Depends on rows that were not created'
+                stack.append(dependent)
+
+    # Order the rest prerequisites first; whatever never becomes ready is on or behind a cycle
+    waiting = {row_number: len(set(row['rowRefs'])) for row_number, row in rows.items() if row_number not in errors}
+    ready = [row_number for row_number, count in waiting.items() if count == 0]
+    ordered = set()
+    while ready:
+        row_number = ready.pop()
+        ordered.add(row_number)
+        for dependent in dependents.get(row_number, ()):
+            if dependent in waiting:
+                waiting[dependent] -= 1
+                if waiting[dependent] == 0:
+                    ready.append(dependent)
+    for row_number in waiting:
+        if row_number not in ordered:
+            errors[row_number] = 'Row dependencies form a cycle'
+
+    return [(row_number, row) for row_number, row in valid if row_number in ordered], sorted(errors.items())
+
+def iter_bulk_rows():
+    """(row number, parsed row or None, parse error) from a JSON array or an NDJSON body"""
+    if request.mimetype in ('application/x-ndjson', 'application/ndjson'):
+        # Read line by line instead of buffering the whole upload
+        row_number = 0
+        for line in request.stream:
+            line = line.strip()
+            if not line:
+                continue
+            row_number += 1
+            try:
+                yield row_number, json.loads(line), None
+            except ValueError as e:
+                yield row_number, None, f"Invalid JSON: {e}"
+        return
+
+    rows = request.get_json(silent=True)
+    if not isinstance(rows, list):
+        yield 0, None, 'Body must be a JSON array or NDJSON'
+        return
+    for row_number, row in enumerate(rows, start=1):
+        yield row_number, row, None
+
+priorities = PriorityEngine()
+jobs = None
+start_lock = threading.Lock()
+
+def start():
+    """Initialize the database, warm up the allocator and start the job workers; returns the app.
+
+    Runs once in the process that serves requests, so importing this module
+    loads nothing: either before app.run() or on the first request when a
+    WSGI server (flask run, gunicorn app:app) imports app directly.
+    """
+    global jobs
+    if jobs is not None:
+        return app
+    with start_lock:
+        if jobs is not None:
+            return app
+        init_db()
+        allocator.warm_up()
+        priorities.set_workforce(allocator.employees)
+        queue = JobQueue(pool, workers=2)
+        queue.register('allocate_task', run_task_allocation)
+        queue.register('allocate_tasks', run_batch_allocation)
+        queue.start()
+        # Set last, so other request threads only skip the lock once everything is ready
+        jobs = queue
+    return app
+
+@app.before_request
+def ensure_started():
+    start()
+
+REQUEST_SECONDS = Histogram('http_request_duration_seconds', 'API request latency',
+                            ['method', 'route', 'status'])
+
+def count_tasks():
+    with pool.connection() as conn:
+        return conn.execute('SELECT COUNT(*) FROM tasks').fetchone()[0]
+
+def cache_stat(name):
+    return lambda: (allocator.embedding_cache.stats()[name] if allocator.embedding_cache else None)
+
+def job_depth():
+    with pool.connection() as conn:
+        rows = conn.execute('SELECT status, COUNT(*) FROM jobs GROUP BY status').fetchall()
+    return {(status,): count for status, count in rows}
+
+Gauge('allocator_employees_loaded', 'Employees in the allocator index',
+      callback=lambda: len(allocator.employees) if allocator.employees else 0)
+Gauge('tasks_total', 'Tasks stored in the database', callback=count_tasks)
+Gauge('embedding_cache_hits_total', 'Embedding lookups served from memory',
+      callback=cache_stat('hits'), type='counter')
+Gauge('embedding_cache_disk_hits_total', 'Embedding lookups served from the SQLite cache',
+      callback=cache_stat('disk_hits'), type='counter')
+Gauge('embedding_cache_misses_total', 'Embedding lookups that ran the model',
+      callback=cache_stat('misses'), type='counter')
+Gauge('embedding_cache_hit_rate', 'Share of embedding lookups served from cache', callback=cache_stat('hit_rate'))
+Gauge('job_queue_jobs', 'Background jobs by status', ['status'], callback=job_depth)
+
+@app.before_request
+def start_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def record_request(response):
+    started = g.pop('request_started', None)
+    if started is not None:
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        REQUEST_SECONDS.observe(time.perf_counter() - started, method=request.method,
+                                route=route, status=response.status_code)
+    return response
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    return Response(render(), mimetype='text/plain; version=0.0.4')
 
 # API Routes
 @app.route('/api/projects', methods=['GET'])
 def get_projects():
-    conn = sqlite3.connect('tasks.db')
+    # Paginate so the dashboard doesn't pull every project on each load
+    limit = min(max(request.args.get('limit', DEFAULT_PAGE_SIZE, type=int), 1), MAX_PAGE_SIZE)
+    offset = max(request.args.get('offset', 0, type=int), 0)
+    search = request.args.get('q', '')
+    pattern = '%' + search.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+    
+    conn = get_db()
     cursor = conn.cursor()
-    cursor.execute('SELECT id, name, description FROM projects')
-    projects_data = cursor.fetchall()
-    
-    projects = []
-    for project in projects_data:
-        # Count tasks for each project
-        cursor.execute('SELECT COUNT(*) FROM tasks WHERE project_id = ?', (project[0],))
-        task_count = cursor.fetchone()[0]
-        
-        projects.append({
+    
+    # Task counts come from the same query, one indexed lookup per project on the page
+    cursor.execute('''
+    SELECT p.id, p.name, p.description,
+           (SELECT COUNT(*) FROM tasks t WHERE t.project_id = p.id)
+    FROM projects p
+    WHERE p.name LIKE ? ESCAPE '\\'
+    ORDER BY p.id
+    LIMIT ? OFFSET ?
+    ''', (pattern, limit, offset))
+    
+    projects = [
+        {
             'id': project[0],
             'name': project[1],
             'description': project[2],
-            'tasks': task_count
-        })
+            'tasks': project[3]
+        }
+        for project in cursor.fetchall()
+    ]
+    
+    cursor.execute("SELECT COUNT(*) FROM projects WHERE name LIKE ? ESCAPE '\\'", (pattern,))
+    total = cursor.fetchone()[0]
     
-    conn.close()
-    return jsonify(projects)
+    response = jsonify(projects)
+    response.headers['X-Total-Count'] = str(total)
+    return response
 
 @app.route('/api/projects', methods=['POST'])
 def create_project():
@@ -73,19 +383,28 @@ def create_project():
     name = data.get('projectName')
     description = data.get('projectDescription')
     
-    conn = sqlite3.connect('tasks.db')
+    conn = get_db()
     cursor = conn.cursor()
     cursor.execute('INSERT INTO projects (name, description) VALUES (?, ?)', 
                    (name, description))
     project_id = cursor.lastrowid
     conn.commit()
-    conn.close()
     
     return jsonify({'id': project_id, 'name': name, 'description': description})
 
 @app.route('/api/projects/<int:project_id>/tasks', methods=['GET'])
 def get_tasks(project_id):
-    conn = sqlite3.connect('tasks.db')
+    # Keyset pagination: ?after=<last task id>&limit=<page size>
+    limit = min(max(request.args.get('limit', DEFAULT_PAGE_SIZE, type=int), 1), MAX_PAGE_SIZE)
+    after = request.args.get('after', 0, type=int)
+    
+    # Optional projection: ?fields=id,title,deadline
+    fields = [f for f in request.args.get('fields', '').split(',') if f] or list(TASK_FIELDS)
+    unknown = [f for f in fields if f not in TASK_FIELDS]
+    if unknown:
+        return jsonify({'error': f"Unknown fields: {', '.join(unknown)}"}), 400
+    
+    conn = get_db()
     cursor = conn.cursor()
     
     # Get project name
@@ -93,157 +412,317 @@ def get_tasks(project_id):
     project = cursor.fetchone()
     
     if not project:
-        conn.close()
         return jsonify({'error': 'Project not found'}), 404
     
     project_name = project[0]
     
-    # Get tasks for project
-    cursor.execute('SELECT id, title, description, skills, deadline FROM tasks WHERE project_id = ?', 
-                   (project_id,))
-    tasks_data = cursor.fetchall()
-    
-    tasks = []
-    for task in tasks_data:
-        # Parse skills from JSON string
-        skills = json.loads(task[3]) if task[3] else []
-        
-        tasks.append({
-            'id': task[0],
-            'title': task[1],
-            'description': task[2],
-            'skills': skills,
-            'deadline': task[4]
-        })
-    
-    conn.close()
+    # Field names are whitelisted above, so they are safe to put in the query
+    # The id is always read because it is the pagination cursor
+    columns = ['id'] + [f for f in fields if f != 'id']
+    cursor.execute(f'''
+    SELECT {', '.join(columns)} FROM tasks
+    WHERE project_id = ? AND id > ?
+    ORDER BY id
+    LIMIT ?
+    ''', (project_id, after, limit + 1))
     
-    return jsonify({
-        'projectName': project_name,
-        'tasks': tasks
-    })
+    def generate():
+        # Rows are written out as they are read, so memory doesn't grow with the page
+        yield '{"projectName": ' + json.dumps(project_name) + ', "tasks": ['
+        last_id = None
+        for count, row in enumerate(cursor):
+            if count == limit:
+                # One extra row means there is another page after the last one sent
+                yield '], "nextAfter": ' + json.dumps(last_id) + '}'
+                return
+            task = dict(zip(columns, row))
+            if 'skills' in task:
+                # Parse skills from JSON string
+                task['skills'] = json.loads(task['skills']) if task['skills'] else []
+            last_id = task['id']
+            if 'id' not in fields:
+                del task['id']
+            yield (', ' if count else '') + json.dumps(task)
+        yield '], "nextAfter": null}'
+    
+    return Response(stream_with_context(generate()), mimetype='application/json')
 
 @app.route('/api/projects/<int:project_id>/tasks', methods=['POST'])
 def create_task(project_id):
-    data = request.json
-    title = data.get('title')
-    description = data.get('description')
-    skills = json.dumps(data.get('skills', []))
-    deadline = data.get('deadline')
+    row, error = validate_task_row(request.get_json(silent=True))
+    if error:
+        return jsonify({'error': error}), 400
+    title = row['title']
+    description = row['description']
+    skills = json.dumps(row['skills'])
+    deadline = row['deadline']
+    hours = row['hours']
+    depends_on = row['dependsOn']
     
-    conn = sqlite3.connect('tasks.db')
+    conn = get_db()
     cursor = conn.cursor()
     
     # Check if project exists
     cursor.execute('SELECT id FROM projects WHERE id = ?', (project_id,))
     if not cursor.fetchone():
-        conn.close()
         return jsonify({'error': 'Project not found'}), 404
     
+    error = check_dependencies(conn, project_id, depends_on)
+    if error:
+        return jsonify({'error': error}), 400
+    
     # Insert task
     cursor.execute('''
-    INSERT INTO tasks (project_id, title, description, skills, deadline)
-    VALUES (?, ?, ?, ?, ?)
-    ''', (project_id, title, description, skills, deadline))
+    INSERT INTO tasks (project_id, title, description, skills, deadline, hours)
+    VALUES (?, ?, ?, ?, ?, ?)
+    ''', (project_id, title, description, skills, deadline, hours))
     
     task_id = cursor.lastrowid
+    save_dependencies(conn, task_id, depends_on)
     conn.commit()
-    conn.close()
+    priorities.task_changed(conn, task_id)
     
-    # Call TASK_ALLOCATOR.py with task data
-    try:
-        result = subprocess.run(
-            ['python', 'TASK_ALLOCATOR.py'], 
-            input=json.dumps({
-                'task_id': task_id,
-                'title': title,
-                'description': description,
-                'skills': data.get('skills', []),
-                'deadline': deadline
-            }).encode(),
-            capture_output=True,
-            text=True
-        )
-        
-        allocator_response = json.loads(result.stdout) if result.stdout else {}
-        
-        return jsonify({
-            'id': task_id,
-            'allocation': allocator_response
-        })
-        
-    except Exception as e:
-        # In a real app, handle this error better
-        print(f"Error calling TASK_ALLOCATOR.py: {e}")
-        return jsonify({
-            'id': task_id,
-            'allocation': {}
-        })
+    # Allocation runs in the background; poll GET /api/jobs/<jobId>, then read /api/tasks/<id>/allocation
+    job_id = jobs.submit('allocate_task', {
+        'id': task_id,
+        'title': title,
+        'skills': row['skills'],
+        'deadline': deadline
+    })
+    
+    return jsonify({'id': task_id, 'jobId': job_id}), 202
+
+@app.route('/api/projects/<int:project_id>/tasks:bulk', methods=['POST'])
+def create_tasks_bulk(project_id):
+    conn = get_db()
+    
+    cursor = conn.execute('SELECT id FROM projects WHERE id = ?', (project_id,))
+    if not cursor.fetchone():
+        return jsonify({'error': 'Project not found'}), 404
+    
+    # Validate every row first; invalid rows are reported and skipped
+    valid = []
+    errors = []
+    for row_number, row, error in iter_bulk_rows():
+        if row_number > MAX_BULK_ROWS:
+            return jsonify({'error': f"At most {MAX_BULK_ROWS} tasks per request"}), 413
+        if error is None:
+            row, error = validate_task_row(row, allow_row_refs=True)
+        if error:
+            errors.append({'row': row_number, 'error': error})
+        else:
+            valid.append((row_number, row))
+    
+    # One query for every task the rows depend on
+    referenced = {d for _, row in valid for d in row['dependsOn']}
+    if referenced:
+        placeholders = ','.join('?' * len(referenced))
+        existing = {task_id for (task_id,) in conn.execute(
+            f"SELECT id FROM tasks WHERE project_id = ? AND id IN ({placeholders})", [project_id, *referenced])}
+        checked = []
+        for row_number, row in valid:
+            missing = sorted(set(row['dependsOn']) - existing)
+            if missing:
+                errors.append({'row': row_number,
+                               'error': f"Unknown tasks in this project: {', '.join(map(str, missing))}"})
+            else:
+                checked.append((row_number, row))
+        valid = checked
+    valid, ref_errors = check_row_refs(valid)
+    errors.extend({'row': row_number, 'error': error} for row_number, error in ref_errors)
+    errors.sort(key=lambda error: error['row'])
+    
+    created = []
+    if valid:
+        with conn:
+            conn.executemany('''
+            INSERT INTO tasks (project_id, title, description, skills, deadline, hours)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ''', [(project_id, row['title'], row['description'], json.dumps(row['skills']), row['deadline'],
+                   row['hours']) for _, row in valid])
+            # The write lock is held until commit, so the new rows are the newest ids of this project
+            ids = [task_id for (task_id,) in conn.execute(
+                'SELECT id FROM tasks WHERE project_id = ? ORDER BY id DESC LIMIT ?', (project_id, len(valid)))]
+            ids.reverse()
+            # Row references resolve to the ids the rows were just given
+            row_ids = {row_number: task_id for task_id, (row_number, _) in zip(ids, valid)}
+            conn.executemany('INSERT OR IGNORE INTO task_dependencies (task_id, depends_on) VALUES (?, ?)',
+                             [(task_id, d) for task_id, (_, row) in zip(ids, valid)
+                              for d in [*row['dependsOn'], *(row_ids[ref] for ref in row['rowRefs'])]])
+        created = [{'row': row_number, 'id': task_id} for task_id, (row_number, _) in zip(ids, valid)]
+        priorities.invalidate(project_id)
+    
+    response = {'created': created, 'errors': errors}
+    # ?allocate=1 runs one batched allocation over every created task in the background
+    if created and request.args.get('allocate') in ('1', 'true'):
+        response['jobId'] = jobs.submit('allocate_tasks', {'tasks': [
+            {'id': task_id, 'title': row['title'], 'skills': row['skills'], 'deadline': row['deadline']}
+            for task_id, (_, row) in zip(ids, valid)
+        ]})
+    
+    status = 201 if created else 400
+    return jsonify(response), status
+
+@app.route('/api/jobs/<int:job_id>', methods=['GET'])
+def get_job(job_id):
+    job = jobs.get(job_id)
+    if not job:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job)
+
+@app.route('/api/tasks/<int:task_id>/allocation', methods=['GET'])
+def get_task_allocation(task_id):
+    conn = get_db()
+    cursor = conn.cursor()
+    cursor.execute('SELECT result, updated_at FROM task_allocations WHERE task_id = ?', (task_id,))
+    row = cursor.fetchone()
+    if not row:
+        return jsonify({'error': 'No allocation for this task yet'}), 404
+    return jsonify({'taskId': task_id, 'allocation': json.loads(row[0]), 'updatedAt': row[1]})
+
+@app.route('/api/projects/<int:project_id>/allocate', methods=['POST'])
+def allocate_project(project_id):
+    conn = get_db()
+    cursor = conn.cursor()
+    
+    # Check if project exists
+    cursor.execute('SELECT id FROM projects WHERE id = ?', (project_id,))
+    if not cursor.fetchone():
+        return jsonify({'error': 'Project not found'}), 404
+    
+    # ?k=<candidates kept per task>&profile=<scoring profile>
+    k = request.args.get('k', DEFAULT_TOP_K, type=int)
+    profile = request.args.get('profile', DEFAULT_PROFILE)
+    if k < 1:
+        return jsonify({'error': 'k must be at least 1'}), 400
+    if profile not in PROFILES:
+        return jsonify({'error': f"Unknown profile; expected one of {', '.join(PROFILES)}"}), 400
+
+    tasks = load_unassigned_tasks(conn, project_id)
+    
+    # One batched encode and one pass over the loaded employees for all tasks
+    allocations = allocator.allocate_batch(tasks_from_api(tasks), k=k, profile=profile, **load_workload(conn))
+    
+    # Optionally solve all tasks jointly so nobody is double-booked
+    if request.args.get('mode') == 'global':
+        assign_globally(allocations, allocator.employees)
+    allocated_ids = {allocation['task_id'] for allocation in allocations}
+    
+    return jsonify({
+        'projectId': project_id,
+        'allocations': [compact_result(allocation) for allocation in allocations],
+        'unallocated': [task['id'] for task in tasks if task['id'] not in allocated_ids]
+    })
+
+@app.route('/api/employees/reload', methods=['POST'])
+def reload_employees():
+    # Pick up a fresh import_employees.py run without restarting the server
+    count = allocator.reload_employees()
+    priorities.set_workforce(allocator.employees)
+    return jsonify({'employees': count})
+
+@app.route('/api/allocations/refresh', methods=['POST'])
+def refresh_all_allocations():
+    # Re-read employees, then recompute only tasks affected by what changed
+    allocator.reload_employees()
+    priorities.set_workforce(allocator.employees)
+    conn = get_db()
+    return jsonify(refresh_allocations(conn, allocator, load_unassigned_tasks(conn)))
+
+@app.route('/api/allocator/stats', methods=['GET'])
+def allocator_stats():
+    return jsonify(allocator.latency_stats())
+
+@app.route('/api/tasks/<int:task_id>', methods=['PATCH'])
+def update_task(task_id):
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({'error': 'Body must be a JSON object'}), 400
+    
+    conn = get_db()
+    cursor = conn.cursor()
+    
+    cursor.execute('SELECT title, description, skills, deadline, hours, project_id FROM tasks WHERE id = ?',
+                   (task_id,))
+    task = cursor.fetchone()
+    if not task:
+        return jsonify({'error': 'Task not found'}), 404
+    
+    # Validate the task as it will be after the update, before anything is written
+    row, error = validate_task_row({
+        'title': data.get('title', task[0]),
+        'description': data.get('description', task[1]),
+        'skills': data['skills'] if 'skills' in data else (json.loads(task[2]) if task[2] else []),
+        'deadline': data.get('deadline', task[3]),
+        'hours': data.get('hours', task[4]),
+        'dependsOn': data.get('dependsOn', [])
+    })
+    if not error and 'dependsOn' in data:
+        error = check_dependencies(conn, task[5], data['dependsOn'], task_id)
+    if error:
+        return jsonify({'error': error}), 400
+    
+    title = row['title']
+    description = row['description']
+    skills = json.dumps(row['skills'])
+    deadline = row['deadline']
+    hours = row['hours']
+    
+    if 'dependsOn' in data:
+        save_dependencies(conn, task_id, data['dependsOn'])
+    cursor.execute('''
+    UPDATE tasks SET title = ?, description = ?, skills = ?, deadline = ?, hours = ?
+    WHERE id = ?
+    ''', (title, description, skills, deadline, hours, task_id))
+    conn.commit()
+    priorities.task_changed(conn, task_id)
+    
+    # The stored fingerprint no longer matches, so only this task is recomputed
+    refreshed = refresh_allocations(conn, allocator, [{
+        'id': task_id,
+        'title': title,
+        'skills': json.loads(skills) if skills else [],
+        'deadline': deadline
+    }], all_tasks=False)
+    if refreshed['recomputed']:
+        # The new allocation resolved the edited skills
+        priorities.task_changed(conn, task_id)
+    
+    return jsonify({'id': task_id, 'changed': refreshed['changed']})
 
 @app.route('/api/tasks/<int:task_id>/assign', methods=['POST'])
 def assign_task(task_id):
     data = request.json
     employee_id = data.get('employeeId')
     
-    conn = sqlite3.connect('tasks.db')
+    conn = get_db()
     cursor = conn.cursor()
     
     # Check if task exists
     cursor.execute('SELECT id FROM tasks WHERE id = ?', (task_id,))
     if not cursor.fetchone():
-        conn.close()
         return jsonify({'error': 'Task not found'}), 404
     
     # Assign task
     cursor.execute('UPDATE tasks SET assigned_to = ? WHERE id = ?', (employee_id, task_id))
     conn.commit()
-    conn.close()
+    priorities.task_changed(conn, task_id)
     
     return jsonify({'success': True})
 
 @app.route('/api/projects/<int:project_id>/prioritize', methods=['GET'])
 def prioritize_tasks(project_id):
-    # Get all tasks for a project
-    conn = sqlite3.connect('tasks.db')
-    cursor = conn.cursor()
+    conn = get_db()
     
-    cursor.execute('''
-    SELECT id, title, description, skills, deadline 
-    FROM tasks 
-    WHERE project_id = ?
-    ''', (project_id,))
-    
-    tasks_data = cursor.fetchall()
-    conn.close()
-    
-    # Format tasks for TASK_PRIORITISER.py
-    tasks = []
-    for task in tasks_data:
-        skills = json.loads(task[3]) if task[3] else []
-        tasks.append({
-            'id': task[0],
-            'title': task[1],
-            'description': task[2],
-            'skills': skills,
-            'deadline': task[4]
-        })
-    
-    # Call TASK_PRIORITISER.py
-    try:
-        result = subprocess.run(
-            ['python', 'TASK_PRIORITISER.py'],
-            input=json.dumps({'tasks': tasks}).encode(),
-            capture_output=True,
-            text=True
-        )
-        
-        prioritized_tasks = json.loads(result.stdout) if result.stdout else []
-        
-        return jsonify(prioritized_tasks)
-        
-    except Exception as e:
-        print(f"Error calling TASK_PRIORITISER.py: {e}")
-        return jsonify(tasks)  # Fall back to unprioritized tasks
+    cursor = conn.execute('SELECT id FROM projects WHERE id = ?', (project_id,))
+    if not cursor.fetchone():
+        return jsonify({'error': 'Project not found'}), 404
+    
+    # Open tasks by deadline, skill scarcity and dependencies; blocked tasks last
+    return jsonify(priorities.ranked(conn, project_id))
 
 if __name__ == '__main__':
+    # The reloader's parent process only watches files; the child it runs serves requests
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        start()
     app.run(debug=True, port=5000)
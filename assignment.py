@@ -0,0 +1,223 @@
+import heapq
+from collections import deque
+
+from TASK_ALLOCATOR import compile_time_windows
+
+# Integer edge score: skill sum dominates, available hours break ties
+SKILL_WEIGHT = 1000
+HOURS_WEIGHT = 10
+
+# Only the best available candidates of each task become edges in the flow graph
+CANDIDATES_PER_TASK = 25
+
+INF = float('inf')
+
+
+class MinCostFlow:
+    """Successive shortest paths with potentials and blocking flow per phase"""
+
+    def __init__(self, node_count):
+        self.node_count = node_count
+        self.graph = [[] for _ in range(node_count)]
+        # Parallel edge arrays; edge i ^ 1 is the reverse of edge i
+        self.to = []
+        self.cap = []
+        self.cost = []
+
+    def add_edge(self, u, v, cap, cost):
+        self.graph[u].append(len(self.to))
+        self.to.append(v)
+        self.cap.append(cap)
+        self.cost.append(cost)
+        self.graph[v].append(len(self.to))
+        self.to.append(u)
+        self.cap.append(0)
+        self.cost.append(-cost)
+        return len(self.to) - 2
+
+    def _dijkstra(self, source, potential):
+        dist = [INF] * self.node_count
+        dist[source] = 0
+        heap = [(0, source)]
+        to, cap, cost, graph = self.to, self.cap, self.cost, self.graph
+        while heap:
+            d, u = heapq.heappop(heap)
+            if d > dist[u]:
+                continue
+            pu = potential[u]
+            for e in graph[u]:
+                if cap[e] > 0:
+                    v = to[e]
+                    nd = d + cost[e] + pu - potential[v]
+                    if nd < dist[v]:
+                        dist[v] = nd
+                        heapq.heappush(heap, (nd, v))
+        return dist
+
+    def _levels(self, source, potential):
+        """BFS levels over residual edges with zero reduced cost"""
+        level = [-1] * self.node_count
+        level[source] = 0
+        queue = deque([source])
+        to, cap, cost, graph = self.to, self.cap, self.cost, self.graph
+        while queue:
+            u = queue.popleft()
+            for e in graph[u]:
+                v = to[e]
+                if cap[e] > 0 and level[v] < 0 and cost[e] + potential[u] - potential[v] == 0:
+                    level[v] = level[u] + 1
+                    queue.append(v)
+        return level
+
+    def _augment(self, source, sink, level, potential, next_edge):
+        """Push one unit along an admissible level-graph path, or return False"""
+        to, cap, cost, graph = self.to, self.cap, self.cost, self.graph
+        path = []
+        u = source
+        while u != sink:
+            edges = graph[u]
+            while next_edge[u] < len(edges):
+                e = edges[next_edge[u]]
+                v = to[e]
+                if (cap[e] > 0 and level[v] == level[u] + 1
+                        and cost[e] + potential[u] - potential[v] == 0):
+                    break
+                next_edge[u] += 1
+            else:
+                # Dead end: retreat and skip the edge that led here
+                if not path:
+                    return False
+                level[u] = -1
+                e = path.pop()
+                u = to[e ^ 1]
+                next_edge[u] += 1
+                continue
+            path.append(e)
+            u = to[e]
+
+        for e in path:
+            cap[e] -= 1
+            cap[e ^ 1] += 1
+        return True
+
+    def solve(self, source, sink):
+        """Send as much flow as possible at minimum cost; returns (flow, cost)"""
+        potential = [0] * self.node_count
+        flow = 0
+        while True:
+            dist = self._dijkstra(source, potential)
+            if dist[sink] == INF:
+                break
+            # Capping at the sink distance keeps every reduced cost non-negative
+            for v in range(self.node_count):
+                potential[v] += min(dist[v], dist[sink])
+
+            while True:
+                level = self._levels(source, potential)
+                if level[sink] < 0:
+                    break
+                next_edge = [0] * self.node_count
+                while self._augment(source, sink, level, potential, next_edge):
+                    flow += 1
+
+        total_cost = sum(
+            self.cost[e] for e in range(0, len(self.to), 2) if self.cap[e ^ 1] > 0
+        )
+        return flow, total_cost
+
+
+def employee_capacities(task_results, employee_index):
+    """How many of these tasks each employee can take, from their shift hours in the project span.
+
+    An employee's hour budget is their shift time inside the union of all
+    task windows. It is turned into a task count by dividing by the
+    average hours the employee would spend on the tasks they qualify for.
+    """
+    per_date = {}
+    task_hours = {}
+    for result in task_results:
+        for window, compiled in zip(result['time_windows'], compile_time_windows(result['time_windows'])):
+            per_date.setdefault((window['day_date'], compiled[0]), []).append(compiled[1:])
+        for emp in result['matching_employees']:
+            if emp['availability']['is_available']:
+                task_hours.setdefault(emp['employee_id'], []).append(
+                    emp['availability']['total_available_hours'])
+
+    merged_windows = []
+    for (_, day_index), intervals in per_date.items():
+        intervals.sort()
+        start, end = intervals[0]
+        for next_start, next_end in intervals[1:]:
+            if next_start > end:
+                merged_windows.append((day_index, start, end))
+                start = next_start
+            end = max(end, next_end)
+        merged_windows.append((day_index, start, end))
+
+    rows = [employee_index.rows[employee_id] for employee_id in task_hours]
+    budget_hours, _ = employee_index.shifts.availability(merged_windows, rows)
+
+    capacities = {}
+    for employee_id, budget in zip(task_hours, budget_hours):
+        hours = task_hours[employee_id]
+        average = sum(hours) / len(hours)
+        if budget > 0:
+            capacities[employee_id] = max(1, int(budget // average)) if average > 0 else len(hours)
+    return capacities
+
+
+def solve_assignment(task_results, capacities, candidates_per_task=CANDIDATES_PER_TASK):
+    """Assign each task to at most one available employee, respecting employee capacities.
+
+    Maximizes the number of assigned tasks first and the total edge score
+    (skill sum, then available hours) second. Returns {task_id: employee_id}
+    with None for tasks that could not be staffed.
+    """
+    employee_nodes = {}
+    edges = []
+    for t, result in enumerate(task_results):
+        available = [
+            emp for emp in result['matching_employees']
+            if emp['availability']['is_available'] and capacities.get(emp['employee_id'], 0) > 0
+        ][:candidates_per_task]
+        for emp in available:
+            employee_nodes.setdefault(emp['employee_id'], len(employee_nodes))
+            score = (sum(emp['matched_skills'].values()) * SKILL_WEIGHT
+                     + int(emp['availability']['total_available_hours'] * HOURS_WEIGHT))
+            edges.append((t, emp['employee_id'], score))
+
+    assignments = {result['task_id']: None for result in task_results}
+    if not edges:
+        return assignments
+
+    # Shift scores into non-negative costs; every unit of flow crosses exactly one task edge
+    max_score = max(score for _, _, score in edges)
+    source, sink = 0, 1
+    task_offset = 2
+    employee_offset = task_offset + len(task_results)
+    flow = MinCostFlow(employee_offset + len(employee_nodes))
+
+    for t in range(len(task_results)):
+        flow.add_edge(source, task_offset + t, 1, 0)
+    task_edges = []
+    for t, employee_id, score in edges:
+        e = flow.add_edge(task_offset + t, employee_offset + employee_nodes[employee_id], 1, max_score - score)
+        task_edges.append((e, t, employee_id))
+    for employee_id, node in employee_nodes.items():
+        flow.add_edge(employee_offset + node, sink, capacities[employee_id], 0)
+
+    flow.solve(source, sink)
+
+    for e, t, employee_id in task_edges:
+        if flow.cap[e] == 0:
+            assignments[task_results[t]['task_id']] = employee_id
+    return assignments
+
+
+def assign_globally(task_results, employee_index, candidates_per_task=CANDIDATES_PER_TASK):
+    """Annotate each task result with its capacity-aware 'assigned_to' employee"""
+    capacities = employee_capacities(task_results, employee_index)
+    assignments = solve_assignment(task_results, capacities, candidates_per_task)
+    for result in task_results:
+        result['assigned_to'] = assignments[result['task_id']]
+    return task_results
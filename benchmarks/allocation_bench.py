@@ -0,0 +1,227 @@
+"""Time each allocator stage on synthetic workforces and compare with a stored baseline.
+
+    python benchmarks/allocation_bench.py
+    python benchmarks/allocation_bench.py --employees 1000 10000 100000 --tasks 100 --span-days 7
+    python benchmarks/allocation_bench.py --save-baseline
+    python benchmarks/allocation_bench.py --compare --repeat 9
+
+Each stage runs --repeat times; the fastest run is compared with the
+baseline and the median is reported alongside it. Runs offline: skills
+are embedded with synthetic.HashingEncoder instead of the sentence
+transformer.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import resource
+import statistics
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from synthetic import HashingEncoder, generate_employee_rows, generate_tasks, rows_to_employees
+from ranking import DEFAULT_TOP_K
+from TASK_ALLOCATOR import (EmployeeIndex, _normalize_rows, calculate_daily_time_windows,
+                            check_employee_availability, compile_time_windows, match_skills_batch,
+                            rank_batch, rank_task, skillset)
+
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+
+# A stage counts as regressed when its fastest run is this much slower than the baseline's...
+DEFAULT_TOLERANCE = 0.25
+# ...and slower by at least this many seconds, so tiny stages don't flap
+NOISE_FLOOR_SECONDS = 0.005
+
+# Runs per stage; other processes only ever slow a run down, so the fastest is the stable one
+DEFAULT_REPEAT = 5
+
+# Pairs checked through the per-employee availability path
+SCALAR_SAMPLE = 2000
+
+
+class StageTimer:
+    """Collects wall time, throughput and memory for each named stage"""
+
+    def __init__(self, trace_memory, repeat=DEFAULT_REPEAT):
+        self.trace_memory = trace_memory
+        self.repeat = repeat
+        self.stages = {}
+
+    def stage(self, name, items, run):
+        """Time run() repeat times and return what its last run returned"""
+        if self.trace_memory:
+            tracemalloc.start()
+        samples = []
+        for _ in range(self.repeat):
+            # Drop the previous run's result so it doesn't count towards this run's memory
+            value = None
+            started = time.perf_counter()
+            value = run()
+            samples.append(time.perf_counter() - started)
+        seconds = min(samples)
+
+        result = {'seconds': round(seconds, 4), 'median_seconds': round(statistics.median(samples), 4),
+                  'items': items, 'per_second': round(items / seconds, 1) if seconds else None}
+        if self.trace_memory:
+            result['peak_mb'] = round(tracemalloc.get_traced_memory()[1] / 2 ** 20, 2)
+            tracemalloc.stop()
+        else:
+            # High-water mark of the whole process so far
+            result['max_rss_mb'] = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+        self.stages[name] = result
+        return value
+
+
+def run_case(employee_count, task_count, span_days, seed, trace_memory, repeat=DEFAULT_REPEAT):
+    rng = random.Random(seed)
+    employees = rows_to_employees(generate_employee_rows(employee_count, rng))
+    tasks = generate_tasks(task_count, rng, span_days=span_days)
+    timer = StageTimer(trace_memory, repeat)
+
+    employee_index = timer.stage('index', employee_count, lambda: EmployeeIndex(employees))
+
+    model = HashingEncoder()
+    skill_matrix = _normalize_rows(model.encode(skillset))
+    skill_count = sum(len(task['skillsRequired']) for task in tasks)
+    matched = timer.stage('match', skill_count, lambda: match_skills_batch(
+        [task['skillsRequired'] for task in tasks], model, skill_matrix))
+
+    prepared = []
+    for task, matched_skills in zip(tasks, matched):
+        windows = calculate_daily_time_windows(task['startTime'], task['endTime'])
+        candidates = employee_index.candidates([m['matched_skill'] for m in matched_skills])
+        prepared.append((windows, candidates))
+
+    pair_count = sum(len(candidates) for _, candidates in prepared)
+
+    def availability():
+        for windows, candidates in prepared:
+            employee_index.shifts.availability(
+                compile_time_windows(windows),
+                [employee_index.rows[employee_id] for employee_id in candidates]
+            )
+    timer.stage('availability', pair_count, availability)
+
+    sample = [
+        (employee_index.by_id[employee_id], windows)
+        for windows, candidates in prepared for employee_id in candidates
+    ][:SCALAR_SAMPLE]
+    timer.stage('availability_scalar', len(sample),
+                lambda: [check_employee_availability(employee, windows) for employee, windows in sample])
+
+    pairs = list(zip(tasks, matched))
+    timer.stage('ranking', task_count,
+                lambda: [rank_task(task, matched_skills, employee_index) for task, matched_skills in pairs])
+
+    def dense_arrays():
+        # Built once per index and kept; start from scratch on every run
+        employee_index._dense = None
+        employee_index.dense_arrays()
+    timer.stage('dense_arrays', employee_count, dense_arrays)
+
+    timer.stage('ranking_dense', task_count, lambda: list(rank_batch(pairs, employee_index)))
+
+    # The API and jobs keep DEFAULT_TOP_K candidates per task
+    timer.stage('ranking_top_k', task_count,
+                lambda: [rank_task(task, matched_skills, employee_index, k=DEFAULT_TOP_K)
+                         for task, matched_skills in pairs])
+    timer.stage('ranking_dense_top_k', task_count,
+                lambda: list(rank_batch(pairs, employee_index, k=DEFAULT_TOP_K)))
+
+    return {
+        'employees': employee_count,
+        'tasks': task_count,
+        'span_days': span_days,
+        'candidate_pairs': pair_count,
+        'stages': timer.stages
+    }
+
+
+def case_key(case):
+    return f"{case['employees']}e-{case['tasks']}t-{case['span_days']}d"
+
+
+def compare(results, baseline, tolerance):
+    """Stages slower than the baseline by more than the tolerance"""
+    regressions = []
+    for case in results:
+        reference = baseline.get('cases', {}).get(case_key(case))
+        if not reference:
+            continue
+        for stage, measured in case['stages'].items():
+            before = reference['stages'].get(stage)
+            if not before:
+                continue
+            slower = measured['seconds'] - before['seconds']
+            if measured['seconds'] > before['seconds'] * (1 + tolerance) and slower > NOISE_FLOOR_SECONDS:
+                regressions.append((case_key(case), stage, before['seconds'], measured['seconds']))
+    return regressions
+
+
+def print_results(results):
+    print(f"{'case':<22} {'stage':<20} {'min s':>9} {'median s':>9} {'items/s':>12} {'memory MB':>10}")
+    for case in results:
+        for stage, measured in case['stages'].items():
+            memory = measured.get('peak_mb', measured.get('max_rss_mb'))
+            print(f"{case_key(case):<22} {stage:<20} {measured['seconds']:>9.4f} {measured['median_seconds']:>9.4f} "
+                  f"{measured['per_second'] or 0:>12,.0f} {memory:>10}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--employees', type=int, nargs='+', default=[1000, 10000])
+    parser.add_argument('--tasks', type=int, nargs='+', default=[50, 200])
+    parser.add_argument('--span-days', type=int, nargs='+', default=[1, 7])
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--trace-memory', action='store_true',
+                        help='per-stage peak memory with tracemalloc (slows the timings down)')
+    parser.add_argument('--output', help='write the results as JSON')
+    parser.add_argument('--save-baseline', action='store_true', help=f"store results in {BASELINE_FILE}")
+    parser.add_argument('--compare', action='store_true', help='fail if a stage regressed against the baseline')
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help="allowed slowdown of a stage's fastest run")
+    parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT, help='runs per stage')
+    args = parser.parse_args()
+
+    results = []
+    for employee_count in args.employees:
+        for task_count in args.tasks:
+            for span_days in args.span_days:
+                results.append(run_case(employee_count, task_count, span_days, args.seed, args.trace_memory,
+                                        args.repeat))
+    print_results(results)
+
+    report = {
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'cases': {case_key(case): case for case in results}
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    if args.save_baseline:
+        with open(BASELINE_FILE, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nBaseline saved to {BASELINE_FILE}")
+
+    if args.compare:
+        if not os.path.exists(BASELINE_FILE):
+            print(f"\nNo baseline at {BASELINE_FILE}; run with --save-baseline first")
+            return 1
+        with open(BASELINE_FILE) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for key, stage, before, after in regressions:
+            print(f"REGRESSION {key} {stage}: {before:.4f}s -> {after:.4f}s")
+        if regressions:
+            return 1
+        print("\nNo regressions against the baseline")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,66 @@
+"""Time the global assignment solver on synthetic workforces of growing size.
+
+    python benchmarks/assignment_scaling.py --employees 1000 --tasks 100 250 500
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from assignment import employee_capacities, solve_assignment
+from synthetic import HashingEncoder, generate_employee_rows, generate_tasks, rows_to_employees
+from TASK_ALLOCATOR import EmployeeIndex, _normalize_rows, match_skills_batch, rank_task, skillset
+
+
+def run(employee_count, task_count, seed):
+    rng = random.Random(seed)
+    employee_index = EmployeeIndex(rows_to_employees(generate_employee_rows(employee_count, rng)))
+    tasks = generate_tasks(task_count, rng, span_days=2)
+    model = HashingEncoder()
+    matched = match_skills_batch([task['skillsRequired'] for task in tasks], model,
+                                 _normalize_rows(model.encode(skillset)))
+
+    started = time.perf_counter()
+    results = [rank_task(task, matched_skills, employee_index)
+               for task, matched_skills in zip(tasks, matched)]
+    results = [result for result in results if result is not None]
+    rank_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    capacities = employee_capacities(results, employee_index)
+    assignments = solve_assignment(results, capacities)
+    solve_seconds = time.perf_counter() - started
+
+    assigned = [employee for employee in assignments.values() if employee is not None]
+    greedy_top = [result['best_candidates'][0]['employee_id'] for result in results if result['best_candidates']]
+    return {
+        'employees': employee_count,
+        'tasks': task_count,
+        'rank_s': rank_seconds,
+        'solve_s': solve_seconds,
+        'assigned': len(assigned),
+        'max_load': max((assigned.count(e) for e in set(assigned)), default=0),
+        'greedy_max_load': max((greedy_top.count(e) for e in set(greedy_top)), default=0)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--employees', type=int, nargs='+', default=[1000])
+    parser.add_argument('--tasks', type=int, nargs='+', default=[100, 250, 500, 1000])
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    print(f"{'employees':>9} {'tasks':>6} {'rank s':>8} {'solve s':>8} {'assigned':>8} {'max load':>8} {'greedy max':>10}")
+    for employee_count in args.employees:
+        for task_count in args.tasks:
+            row = run(employee_count, task_count, args.seed)
+            print(f"{row['employees']:>9} {row['tasks']:>6} {row['rank_s']:>8.2f} {row['solve_s']:>8.2f} "
+                  f"{row['assigned']:>8} {row['max_load']:>8} {row['greedy_max_load']:>10}")
+
+
+if __name__ == '__main__':
+    main()
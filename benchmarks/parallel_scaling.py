@@ -0,0 +1,58 @@
+"""Time task ranking with 1..N worker processes and check the results match the serial run.
+
+    python benchmarks/parallel_scaling.py
+    python benchmarks/parallel_scaling.py --employees 10000 --tasks 400 --workers 1 2 4 8
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from synthetic import HashingEncoder, generate_employee_rows, generate_tasks, rows_to_employees
+from TASK_ALLOCATOR import EmployeeIndex, _normalize_rows, iter_allocations, skillset
+
+
+def summary(results):
+    """What must not change between runs: task order and the ranked candidates"""
+    return [(result['task_id'], [emp['employee_id'] for emp in result['matching_employees']])
+            for result in results]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--employees', type=int, default=10000)
+    parser.add_argument('--tasks', type=int, default=200)
+    parser.add_argument('--span-days', type=int, default=3)
+    parser.add_argument('--top-k', type=int, default=25)
+    parser.add_argument('--workers', type=int, nargs='+',
+                        default=sorted({1, 2, 4, os.cpu_count() or 1}))
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    employee_index = EmployeeIndex(rows_to_employees(generate_employee_rows(args.employees, rng)))
+    tasks = generate_tasks(args.tasks, rng, span_days=args.span_days)
+    model = HashingEncoder()
+    skill_matrix = _normalize_rows(model.encode(skillset))
+
+    print(f"{os.cpu_count()} CPU cores, {args.employees} employees, {args.tasks} tasks, top {args.top_k}")
+    print(f"{'workers':>7} {'seconds':>9} {'tasks/s':>9} {'speedup':>8} {'same as serial':>15}")
+    reference = None
+    serial_seconds = None
+    for workers in args.workers:
+        started = time.perf_counter()
+        results = list(iter_allocations(tasks, employee_index, model, skill_matrix,
+                                        workers=workers, k=args.top_k))
+        seconds = time.perf_counter() - started
+
+        if reference is None:
+            reference, serial_seconds = summary(results), seconds
+        print(f"{workers:>7} {seconds:>9.3f} {len(results) / seconds:>9.1f} "
+              f"{serial_seconds / seconds:>8.2f} {str(summary(results) == reference):>15}")
+
+
+if __name__ == '__main__':
+    main()
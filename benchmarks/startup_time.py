@@ -0,0 +1,101 @@
+"""Time how long it takes to import the allocator and reach common entry points.
+
+    python benchmarks/startup_time.py
+    python benchmarks/startup_time.py --repeat 20 --with-model
+
+Each scenario runs in a fresh interpreter. Times are wall clock for the
+whole process minus a bare `python -c pass`, so they show what importing
+our code costs on top of interpreter startup.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Libraries that should only be imported once they are actually needed
+HEAVY_MODULES = ('numpy', 'sentence_transformers', 'torch')
+
+REPORT = (
+    "import json, sys\n"
+    "print(json.dumps([name for name in %r if name in sys.modules]))\n" % (HEAVY_MODULES,)
+)
+
+SCENARIOS = {
+    'bare interpreter': 'pass',
+    'import TASK_ALLOCATOR': 'import TASK_ALLOCATOR\n' + REPORT,
+    'availability helpers': (
+        "from TASK_ALLOCATOR import calculate_daily_time_windows, check_employee_availability\n"
+        "windows = calculate_daily_time_windows('2026:01:05:09:00', '2026:01:06:17:00')\n"
+        "check_employee_availability({'shifts': {'monday_in': '08:00', 'monday_out': '16:00'}}, windows)\n"
+        + REPORT
+    ),
+    'cli --help': (
+        "import contextlib, io, runpy, sys\n"
+        "sys.argv = ['TASK_ALLOCATOR.py', '--help']\n"
+        "with contextlib.redirect_stdout(io.StringIO()):\n"
+        "    try:\n"
+        "        runpy.run_path('TASK_ALLOCATOR.py', run_name='__main__')\n"
+        "    except SystemExit:\n"
+        "        pass\n"
+        + REPORT
+    ),
+}
+
+# Needs the sentence transformer model, so only runs with --with-model
+MODEL_SCENARIO = (
+    'engine warm-up',
+    "from TASK_ALLOCATOR import AllocatorEngine\n"
+    "AllocatorEngine().warm_up()\n" + REPORT
+)
+
+
+def run_once(code):
+    started = time.perf_counter()
+    completed = subprocess.run([sys.executable, '-c', code], cwd=ROOT, capture_output=True, text=True)
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    if completed.returncode != 0:
+        raise RuntimeError(completed.stderr.strip().splitlines()[-1] if completed.stderr else 'failed')
+    lines = completed.stdout.strip().splitlines()
+    return elapsed_ms, json.loads(lines[-1]) if lines else []
+
+
+def measure(code, repeat):
+    samples = []
+    loaded = []
+    for _ in range(repeat):
+        elapsed_ms, loaded = run_once(code)
+        samples.append(elapsed_ms)
+    return statistics.median(samples), min(samples), loaded
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=10)
+    parser.add_argument('--with-model', action='store_true', help='also time a full engine warm-up')
+    args = parser.parse_args()
+
+    scenarios = dict(SCENARIOS)
+    if args.with_model:
+        scenarios[MODEL_SCENARIO[0]] = MODEL_SCENARIO[1]
+
+    baseline_ms = None
+    print(f"{'scenario':<24} {'median ms':>10} {'min ms':>8} {'over bare':>10}  heavy modules loaded")
+    for name, code in scenarios.items():
+        try:
+            median_ms, min_ms, loaded = measure(code, args.repeat)
+        except RuntimeError as e:
+            print(f"{name:<24} failed: {e}")
+            continue
+        if baseline_ms is None:
+            baseline_ms = median_ms
+        print(f"{name:<24} {median_ms:>10.1f} {min_ms:>8.1f} {median_ms - baseline_ms:>10.1f}  "
+              f"{', '.join(loaded) or '-'}")
+
+
+if __name__ == '__main__':
+    main()
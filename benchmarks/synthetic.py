@@ -0,0 +1,114 @@
+"""Synthetic workforces and task batches for the allocator benchmarks."""
+import hashlib
+import os
+import random
+import sys
+from datetime import datetime, timedelta
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from import_employees import normalize_row
+from TASK_ALLOCATOR import skillset
+
+# (start, end) shift patterns, including overnight ones
+SHIFT_PATTERNS = [
+    ('06:00', '14:00'), ('08:00', '16:00'), ('09:00', '17:30'),
+    ('14:00', '22:00'), ('22:00', '06:00'), ('18:00', '24:48')
+]
+
+WEEKDAYS = ['SUNDAY', 'MONDAY', 'TUESDAY', 'WEDNESDAY', 'THURSDAY', 'FRIDAY', 'SATURDAY']
+
+# Free-text spellings users type for skillset entries
+SKILL_VARIANTS = {
+    'PLC-Programming': ['PLC programming', 'plc', 'programmable logic controllers'],
+    'Welding': ['welding', 'MIG welding', 'arc welder'],
+    'HVAC': ['hvac repair', 'air conditioning', 'heating and ventilation'],
+    'CNC-Operation': ['CNC operator', 'cnc machining'],
+    'Motor-Repair': ['motor repair', 'electric motor rewinding'],
+}
+
+
+def generate_employee_rows(count, rng, shift_days=(4, 7)):
+    """EMPLOYEE_DATA rows: five skill/score pairs and per-weekday start/end times"""
+    rows = []
+    for i in range(count):
+        row = {'EMPLOYEE_ID': f"E{i + 1:06d}"}
+        skills = rng.sample(skillset, rng.randint(2, 5))
+        for n in range(1, 6):
+            skill = skills[n - 1] if n <= len(skills) else None
+            row[f"SKILL_{n}"] = skill
+            row[f"SKILL_{n}_SCORE"] = rng.randint(1, 10) if skill else None
+
+        shift_in, shift_out = rng.choice(SHIFT_PATTERNS)
+        working = set(rng.sample(WEEKDAYS, rng.randint(*shift_days)))
+        for day in WEEKDAYS:
+            row[f"{day}_STARTING_TIME"] = f"{shift_in}:00" if day in working else None
+            row[f"{day}_ENDING_TIME"] = f"{shift_out}:00" if day in working else None
+        rows.append(row)
+    return rows
+
+
+def rows_to_employees(rows):
+    """Convert EMPLOYEE_DATA rows to the allocator's employee dicts"""
+    employees = []
+    for row in rows:
+        employee_id, skills, shifts = normalize_row(row)
+        employees.append({
+            'employee_id': employee_id,
+            'skills': {skill: score for _, skill, score in skills},
+            'shifts': {
+                key: value
+                for _, day, shift_in, shift_out in shifts
+                for key, value in ((f"{day}_in", shift_in), (f"{day}_out", shift_out))
+            }
+        })
+    return employees
+
+
+def generate_employees(count, seed=0):
+    return rows_to_employees(generate_employee_rows(count, random.Random(seed)))
+
+
+def generate_tasks(count, rng, span_days=3, start=datetime(2026, 1, 5, 8, 0)):
+    """Allocator-format tasks with free-text skills and spans of up to span_days"""
+    tasks = []
+    for i in range(count):
+        begin = start + timedelta(days=rng.randint(0, 13), hours=rng.randint(0, 10))
+        end = begin + timedelta(minutes=rng.randint(60, max(61, span_days * 24 * 60)))
+        skills = []
+        for skill in rng.sample(skillset, rng.randint(1, 3)):
+            skills.append(rng.choice(SKILL_VARIANTS.get(skill, [skill]) + [skill]))
+        tasks.append({
+            'id': i + 1,
+            'taskName': f"Task {i + 1}",
+            'skillsRequired': skills,
+            'startTime': begin.strftime('%Y:%m:%d:%H:%M'),
+            'endTime': end.strftime('%Y:%m:%d:%H:%M')
+        })
+    return tasks
+
+
+class HashingEncoder:
+    """Offline stand-in for SentenceTransformer: hashed character trigrams.
+
+    Deterministic and fast, so benchmarks measure the allocator rather than
+    the transformer. Spelling variants of a skill land close together.
+    """
+
+    def __init__(self, dimensions=384):
+        self.dimensions = dimensions
+        self.calls = 0
+        self.texts_encoded = 0
+
+    def encode(self, texts, **kwargs):
+        self.calls += 1
+        self.texts_encoded += len(texts)
+        vectors = np.zeros((len(texts), self.dimensions), dtype=np.float32)
+        for row, text in enumerate(texts):
+            padded = f"  {text.lower().replace('-', ' ')}  "
+            for i in range(len(padded) - 2):
+                digest = hashlib.blake2b(padded[i:i + 3].encode('utf-8'), digest_size=4).digest()
+                vectors[row, int.from_bytes(digest, 'little') % self.dimensions] += 1.0
+        return vectors
@@ -0,0 +1,129 @@
+import hashlib
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+
+from lazy_import import LazyImport
+
+np = LazyImport('numpy')
+
+
+def normalize_text(text):
+    """Canonical form used as the cache key for a free-text skill"""
+    return ' '.join(str(text).lower().split())
+
+
+class EmbeddingCache:
+    """In-memory LRU of text embeddings backed by a SQLite table on disk"""
+
+    def __init__(self, model_id, path=os.path.join('.embedding_cache', 'embeddings.db'),
+                 max_entries=10000, max_disk_entries=200000):
+        self.model_id = model_id
+        self.path = path
+        self.max_entries = max_entries
+        self.max_disk_entries = max_disk_entries
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute('''
+        CREATE TABLE IF NOT EXISTS embeddings (
+            key TEXT PRIMARY KEY,
+            model_id TEXT NOT NULL,
+            text TEXT NOT NULL,
+            vector BLOB NOT NULL
+        )
+        ''')
+        self._conn.commit()
+
+    def _key(self, text):
+        return hashlib.sha1(f"{self.model_id}\0{text}".encode('utf-8')).hexdigest()
+
+    def _remember(self, key, vector):
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def encode(self, texts, model):
+        """Return normalized embeddings for texts, running the model only for unseen ones"""
+        normalized = [normalize_text(t) for t in texts]
+        keys = [self._key(t) for t in normalized]
+        found = {}
+
+        with self._lock:
+            for key in keys:
+                if key in self._memory and key not in found:
+                    self._memory.move_to_end(key)
+                    found[key] = self._memory[key]
+                    self.hits += 1
+
+            lookup = list({key for key in keys if key not in found})
+            for i in range(0, len(lookup), 500):
+                chunk = lookup[i:i + 500]
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(chunk))})",
+                    chunk
+                ).fetchall()
+                for key, blob in rows:
+                    vector = np.frombuffer(blob, dtype=np.float32)
+                    found[key] = vector
+                    self._remember(key, vector)
+                    self.disk_hits += 1
+
+        missing = {}
+        for key, text in zip(keys, normalized):
+            if key not in found:
+                missing.setdefault(key, text)
+
+        if missing:
+            vectors = np.asarray(model.encode(list(missing.values())), dtype=np.float32)
+            vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+            with self._lock:
+                self.misses += len(missing)
+                rows = []
+                for (key, text), vector in zip(missing.items(), vectors):
+                    found[key] = vector
+                    self._remember(key, vector)
+                    rows.append((key, self.model_id, text, vector.tobytes()))
+                self._conn.executemany(
+                    'INSERT OR REPLACE INTO embeddings (key, model_id, text, vector) VALUES (?, ?, ?, ?)',
+                    rows
+                )
+                self._trim_disk()
+                self._conn.commit()
+
+        return np.stack([found[key] for key in keys]) if keys else np.empty((0, 0), dtype=np.float32)
+
+    def _trim_disk(self):
+        """Drop the oldest rows once the on-disk store exceeds its bound"""
+        count = self._conn.execute('SELECT COUNT(*) FROM embeddings').fetchone()[0]
+        if count > self.max_disk_entries:
+            self._conn.execute(
+                'DELETE FROM embeddings WHERE rowid IN '
+                '(SELECT rowid FROM embeddings ORDER BY rowid LIMIT ?)',
+                (count - self.max_disk_entries,)
+            )
+
+    def stats(self):
+        """Hit/miss counters and current sizes"""
+        lookups = self.hits + self.disk_hits + self.misses
+        return {
+            'hits': self.hits,
+            'disk_hits': self.disk_hits,
+            'misses': self.misses,
+            'hit_rate': round((self.hits + self.disk_hits) / lookups, 4) if lookups else None,
+            'memory_entries': len(self._memory),
+            'max_entries': self.max_entries
+        }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,347 @@
+"""Compile employees into a binary snapshot that allocator processes memory-map.
+
+    python employee_snapshot.py [--db tasks.db] [--employees employees_data.json] [--output employees.snapshot]
+
+The snapshot holds fixed-width arrays: employee ids, skill names, an
+employees x skills proficiency matrix, the skill index as row postings,
+compiled shift minutes, the original shift strings and the employees x
+skillset matrix rank_batch scores with. Every process maps
+the same file read-only, so the pages are shared instead of each worker
+building its own copy from JSON or SQLite. A new snapshot is written to a
+temporary file and swapped in with os.replace, and processes that have the
+old one mapped pick up the new file on their next allocation.
+"""
+import argparse
+import hashlib
+import json
+import mmap
+import os
+import struct
+
+from lazy_import import LazyImport
+from TASK_ALLOCATOR import (DAYS, MIN_PROFICIENCY, SKILL_COLUMNS, ShiftTable, compile_shifts, load_employees,
+                            load_employees_from_db, skillset)
+
+np = LazyImport('numpy')
+
+DEFAULT_PATH = 'employees.snapshot'
+
+MAGIC = b'EMPSNAP\0'
+FORMAT_VERSION = 2
+
+# magic, format version, employees, skills, id width, skill width, shift text width,
+# min proficiency, digest of the source data, skillset entries, skillset name width
+HEADER = struct.Struct('<8sIQIIIId20sII')
+SECTIONS = ('ids', 'skill_names', 'proficiency', 'posting_offsets', 'postings',
+            'shift_starts', 'shift_ends', 'shift_text', 'skillset_names', 'skillset_proficiency')
+SECTION_TABLE = struct.Struct('<' + 'QQ' * len(SECTIONS))
+
+ALIGNMENT = 8
+
+
+def employees_digest(employees):
+    """Version of an employee dataset; equal data gives an equal snapshot"""
+    encoded = json.dumps(
+        sorted(employees, key=lambda employee: str(employee['employee_id'])),
+        sort_keys=True, default=str
+    )
+    return hashlib.sha1(encoded.encode('utf-8')).digest()
+
+
+def _fixed_width(values):
+    encoded = [str(value).encode('utf-8') for value in values]
+    width = max((len(value) for value in encoded), default=1) or 1
+    return np.array(encoded, dtype=f"S{width}"), width
+
+
+def compile_arrays(employees, min_proficiency=MIN_PROFICIENCY):
+    """Fixed-width arrays for every snapshot section, rows sorted by employee id"""
+    employees = sorted(employees, key=lambda employee: str(employee['employee_id']))
+    skills = sorted({skill for employee in employees for skill in employee.get('skills', {})})
+    column = {skill: j for j, skill in enumerate(skills)}
+
+    ids, id_width = _fixed_width(employee['employee_id'] for employee in employees)
+    skill_names, skill_width = _fixed_width(skills)
+
+    # NaN marks a skill the employee doesn't have
+    proficiency = np.full((len(employees), len(skills)), np.nan, dtype=np.float32)
+    starts = np.zeros((len(employees), len(DAYS), 2), dtype=np.int16)
+    ends = np.zeros((len(employees), len(DAYS), 2), dtype=np.int16)
+    shift_values = []
+    for row, employee in enumerate(employees):
+        for skill, prof in employee.get('skills', {}).items():
+            proficiency[row, column[skill]] = prof
+        shifts = employee.get('shifts', {})
+        week, _, _ = compile_shifts(shifts)
+        for day_index, intervals in enumerate(week):
+            for slot, (start, end) in enumerate(intervals):
+                starts[row, day_index, slot] = start
+                ends[row, day_index, slot] = end
+        for day in DAYS:
+            for edge in ('in', 'out'):
+                value = shifts.get(f"{day}_{edge}")
+                shift_values.append('' if value is None else value)
+    shift_text, shift_width = _fixed_width(shift_values)
+    shift_text = shift_text.reshape(len(employees), len(DAYS), 2)
+
+    # Qualified rows per skill, strongest first and then by employee id, like build_skill_index
+    postings = []
+    posting_offsets = [0]
+    for j in range(len(skills)):
+        profs = proficiency[:, j]
+        rows = np.nonzero(profs >= min_proficiency)[0]
+        rows = rows[np.lexsort((rows, -profs[rows]))]
+        postings.append(rows.astype(np.int32))
+        posting_offsets.append(posting_offsets[-1] + len(rows))
+
+    # Dense qualifying proficiencies over the allocator's skillset; NaN fails the comparison too
+    skillset_names, skillset_width = _fixed_width(skillset)
+    skillset_proficiency = np.zeros((len(employees), len(skillset)))
+    for skill, j in SKILL_COLUMNS.items():
+        if skill in column:
+            profs = proficiency[:, column[skill]]
+            skillset_proficiency[:, j] = np.where(profs >= min_proficiency, profs, 0)
+
+    arrays = {
+        'ids': ids,
+        'skill_names': skill_names,
+        'proficiency': proficiency,
+        'posting_offsets': np.array(posting_offsets, dtype=np.int64),
+        'postings': np.concatenate(postings) if postings else np.zeros(0, dtype=np.int32),
+        'shift_starts': starts,
+        'shift_ends': ends,
+        'shift_text': shift_text,
+        'skillset_names': skillset_names,
+        'skillset_proficiency': skillset_proficiency
+    }
+    widths = (id_width, skill_width, shift_width, skillset_width)
+    return arrays, len(employees), len(skills), widths
+
+
+def write_snapshot(employees, path=DEFAULT_PATH, min_proficiency=MIN_PROFICIENCY):
+    """Write a snapshot of employees and atomically replace path with it; returns its digest"""
+    arrays, count, skill_count, (id_width, skill_width, shift_width, skillset_width) = compile_arrays(
+        employees, min_proficiency)
+    digest = employees_digest(employees)
+
+    offset = HEADER.size + SECTION_TABLE.size
+    table = []
+    for name in SECTIONS:
+        offset += -offset % ALIGNMENT
+        table.extend((offset, arrays[name].nbytes))
+        offset += arrays[name].nbytes
+
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, FORMAT_VERSION, count, skill_count, id_width, skill_width, shift_width,
+                            min_proficiency, digest, len(skillset), skillset_width))
+        f.write(SECTION_TABLE.pack(*table))
+        for name, section_offset in zip(SECTIONS, table[::2]):
+            f.write(b'\0' * (section_offset - f.tell()))
+            f.write(np.ascontiguousarray(arrays[name]).tobytes())
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    return digest.hex()
+
+
+def read_version(path):
+    """Digest of the data in a snapshot file, read from its header only"""
+    with open(path, 'rb') as f:
+        header = HEADER.unpack(f.read(HEADER.size))
+    return header[8].hex()
+
+
+class _Employees:
+    """Sequence of employee dicts, built from the snapshot as they are read"""
+
+    def __init__(self, index):
+        self._index = index
+
+    def __len__(self):
+        return len(self._index)
+
+    def __getitem__(self, row):
+        if not -len(self) <= row < len(self):
+            raise IndexError(row)
+        return self._index.employee(row % len(self))
+
+    def __iter__(self):
+        return (self._index.employee(row) for row in range(len(self)))
+
+
+class _ById:
+    def __init__(self, index):
+        self._index = index
+
+    def __getitem__(self, employee_id):
+        return self._index.employee(self._index.row_of(employee_id))
+
+    def __contains__(self, employee_id):
+        try:
+            self._index.row_of(employee_id)
+        except KeyError:
+            return False
+        return True
+
+    def get(self, employee_id, default=None):
+        return self[employee_id] if employee_id in self else default
+
+
+class _Rows(_ById):
+    def __getitem__(self, employee_id):
+        return self._index.row_of(employee_id)
+
+
+class SnapshotIndex:
+    """Read-only EmployeeIndex backed by a memory-mapped snapshot file"""
+
+    def __init__(self, path=DEFAULT_PATH):
+        self.path = path
+        with open(path, 'rb') as f:
+            stat = os.fstat(f.fileno())
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.identity = (stat.st_ino, stat.st_mtime_ns)
+
+        magic, format_version = struct.unpack_from('<8sI', self._mmap, 0)
+        if magic != MAGIC or format_version != FORMAT_VERSION:
+            raise ValueError(f"{path} is not a version {FORMAT_VERSION} employee snapshot")
+        (_, _, count, skill_count, id_width, skill_width, shift_width, self.min_proficiency, digest,
+         skillset_count, skillset_width) = HEADER.unpack_from(self._mmap, 0)
+        self.version = digest.hex()
+        self.count = count
+
+        table = SECTION_TABLE.unpack_from(self._mmap, HEADER.size)
+        offsets = dict(zip(SECTIONS, table[::2]))
+        shapes = {
+            'ids': (f"S{id_width}", (count,)),
+            'skill_names': (f"S{skill_width}", (skill_count,)),
+            'proficiency': (np.float32, (count, skill_count)),
+            'posting_offsets': (np.int64, (skill_count + 1,)),
+            'shift_starts': (np.int16, (count, len(DAYS), 2)),
+            'shift_ends': (np.int16, (count, len(DAYS), 2)),
+            'shift_text': (f"S{shift_width}", (count, len(DAYS), 2)),
+            'skillset_names': (f"S{skillset_width}", (skillset_count,)),
+            'skillset_proficiency': (np.float64, (count, skillset_count)),
+        }
+        arrays = {}
+        for name, (dtype, shape) in shapes.items():
+            arrays[name] = np.frombuffer(self._mmap, dtype=dtype, count=int(np.prod(shape)),
+                                         offset=offsets[name]).reshape(shape)
+        postings_count = int(arrays['posting_offsets'][-1])
+        arrays['postings'] = np.frombuffer(self._mmap, dtype=np.int32, count=postings_count,
+                                           offset=offsets['postings'])
+
+        self._ids = arrays['ids']
+        self._proficiency = arrays['proficiency']
+        self._shift_text = arrays['shift_text']
+        self.skills = [name.decode('utf-8') for name in arrays['skill_names']]
+        self._column = {skill: j for j, skill in enumerate(self.skills)}
+        bounds = arrays['posting_offsets']
+        self.skill_index = {
+            skill: arrays['postings'][bounds[j]:bounds[j + 1]]
+            for j, skill in enumerate(self.skills) if bounds[j + 1] > bounds[j]
+        }
+        self.shifts = ShiftTable.from_arrays(arrays['shift_starts'], arrays['shift_ends'])
+
+        self.employees = _Employees(self)
+        self.by_id = _ById(self)
+        self.rows = _Rows(self)
+
+        # Shared through the mapping unless the skillset changed since the file was written
+        self._skillset_proficiency = None
+        if [name.decode('utf-8') for name in arrays['skillset_names']] == list(skillset):
+            self._skillset_proficiency = arrays['skillset_proficiency']
+        self._dense = None
+
+    def __len__(self):
+        return self.count
+
+    def __reduce__(self):
+        # Worker processes map the file themselves instead of receiving a pickled copy
+        return SnapshotIndex, (self.path,)
+
+    def is_stale(self):
+        """True once the file at path has been replaced by a newer snapshot"""
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return False
+        return (stat.st_ino, stat.st_mtime_ns) != self.identity
+
+    def row_of(self, employee_id):
+        key = str(employee_id).encode('utf-8')
+        row = int(np.searchsorted(self._ids, key))
+        if row == self.count or self._ids[row] != key:
+            raise KeyError(employee_id)
+        return row
+
+    def employee(self, row):
+        """The employee dict at a row, in the allocator's format"""
+        skills = {}
+        for j in np.nonzero(~np.isnan(self._proficiency[row]))[0]:
+            prof = float(self._proficiency[row, j])
+            skills[self.skills[j]] = int(prof) if prof.is_integer() else prof
+        shifts = {}
+        for day_index, day in enumerate(DAYS):
+            shift_in, shift_out = self._shift_text[row, day_index]
+            if shift_in:
+                shifts[f"{day}_in"] = shift_in.decode('utf-8')
+            if shift_out:
+                shifts[f"{day}_out"] = shift_out.decode('utf-8')
+        return {'employee_id': self._ids[row].decode('utf-8'), 'skills': skills, 'shifts': shifts}
+
+    def dense_arrays(self):
+        """(proficiency, id_rank, ids) for rank_batch, like EmployeeIndex.dense_arrays"""
+        if self._dense is None:
+            proficiency = self._skillset_proficiency
+            if proficiency is None:
+                proficiency = self._local_skillset_proficiency()
+            # Rows are already in employee id order
+            self._dense = (proficiency, np.arange(self.count), self._ids.astype(str).tolist())
+        return self._dense
+
+    def _local_skillset_proficiency(self):
+        """The employees x skillset matrix built in this process, for a snapshot of another skillset"""
+        proficiency = np.zeros((self.count, len(skillset)))
+        for skill, column in SKILL_COLUMNS.items():
+            if skill in self._column:
+                profs = self._proficiency[:, self._column[skill]]
+                # NaN, an absent skill, fails the comparison too
+                proficiency[:, column] = np.where(profs >= self.min_proficiency, profs, 0)
+        return proficiency
+
+    def candidates(self, required_skills):
+        """Employees holding at least one required skill, with their qualifying proficiencies"""
+        candidates = {}
+        for skill in dict.fromkeys(required_skills):
+            rows = self.skill_index.get(skill)
+            if rows is None:
+                continue
+            profs = self._proficiency[rows, self._column[skill]]
+            ids = self._ids[rows].astype(str)
+            for employee_id, prof in zip(ids.tolist(), profs.tolist()):
+                candidates.setdefault(employee_id, {})[skill] = int(prof) if prof.is_integer() else prof
+        return candidates
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--db', default='tasks.db', help='database with imported employees')
+    parser.add_argument('--employees', default='employees_data.json',
+                        help='employee data file, used when the database has no employees')
+    parser.add_argument('--output', default=DEFAULT_PATH)
+    args = parser.parse_args()
+
+    employees = load_employees_from_db(args.db) if os.path.exists(args.db) else []
+    employees = employees or load_employees(args.employees)
+    if not employees:
+        print("No employees data loaded")
+        return
+    version = write_snapshot(employees, args.output)
+    print(f"Wrote {len(employees)} employees to {args.output} "
+          f"({os.path.getsize(args.output) / 2 ** 20:.1f}MB, version {version[:12]})")
+
+
+if __name__ == '__main__':
+    main()
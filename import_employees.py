@@ -0,0 +1,248 @@
+"""Import an EMPLOYEE_DATA SQL dump into the normalized employee tables of tasks.db.
+
+    python import_employees.py employee_data.sql [--db tasks.db] [--append] [--snapshot employees.snapshot]
+
+The allocator's employee snapshot is recompiled from the imported tables,
+so a server (re)started after an import maps the new data.
+"""
+import argparse
+import re
+import sqlite3
+import time
+
+# Same order and spelling as the allocator's shift keys ('monday_in', ...)
+DAYS = ['monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday']
+
+# Column order of EMPLOYEE_DATA when a dump has no CREATE TABLE or column list
+DEFAULT_COLUMNS = (
+    ['Employee_ID']
+    + [name for i in range(1, 6) for name in (f"SKILL_{i}", f"SKILL_{i}_SCORE")]
+    + [f"{day.upper()}_{edge}_TIME" for day in ['sunday'] + DAYS[:-1] for edge in ('STARTING', 'ENDING')]
+)
+
+# Rows buffered per executemany call; the whole import is still one transaction
+BATCH_SIZE = 5000
+
+INSERT_PREFIX = re.compile(r'^\s*INSERT\s+INTO\s+[`"]?EMPLOYEE_DATA[`"]?\s*(\(([^)]*)\))?\s*VALUES', re.I)
+CREATE_PREFIX = re.compile(r'^\s*CREATE\s+TABLE\s+[`"]?EMPLOYEE_DATA[`"]?\s*\(', re.I)
+
+
+def create_employee_tables(conn):
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS employees (
+        employee_id TEXT PRIMARY KEY
+    )
+    ''')
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS employee_skills (
+        employee_id TEXT NOT NULL,
+        skill TEXT NOT NULL,
+        proficiency INTEGER NOT NULL,
+        PRIMARY KEY (employee_id, skill),
+        FOREIGN KEY (employee_id) REFERENCES employees (employee_id)
+    ) WITHOUT ROWID
+    ''')
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS employee_shifts (
+        employee_id TEXT NOT NULL,
+        day TEXT NOT NULL,
+        shift_in TEXT,
+        shift_out TEXT,
+        PRIMARY KEY (employee_id, day),
+        FOREIGN KEY (employee_id) REFERENCES employees (employee_id)
+    ) WITHOUT ROWID
+    ''')
+    # Candidate lookups go skill -> strongest employees
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_employee_skills_skill ON employee_skills (skill, proficiency)')
+
+
+def iter_statements(lines):
+    """Yield SQL statements one at a time, splitting on semicolons outside quotes"""
+    buffer = []
+    in_quote = False
+    for line in lines:
+        start = 0
+        for i, char in enumerate(line):
+            if char == "'":
+                in_quote = not in_quote
+            elif char == ';' and not in_quote:
+                buffer.append(line[start:i])
+                yield ''.join(buffer)
+                buffer = []
+                start = i + 1
+        buffer.append(line[start:])
+    if ''.join(buffer).strip():
+        yield ''.join(buffer)
+
+
+def parse_values(text):
+    """Parse '(a, 'b', NULL), (...)' into lists of Python values"""
+    rows = []
+    row = None
+    i = 0
+    length = len(text)
+    while i < length:
+        char = text[i]
+        if char == '(':
+            row = []
+            i += 1
+        elif char == ')':
+            rows.append(row)
+            row = None
+            i += 1
+        elif char == "'":
+            # Quoted string, '' is an escaped quote
+            value = []
+            i += 1
+            while i < length:
+                if text[i] == "'":
+                    if i + 1 < length and text[i + 1] == "'":
+                        value.append("'")
+                        i += 2
+                        continue
+                    break
+                value.append(text[i])
+                i += 1
+            row.append(''.join(value))
+            i += 1
+        elif char in ', \t\r\n':
+            i += 1
+        else:
+            end = i
+            while end < length and text[end] not in ',)':
+                end += 1
+            token = text[i:end].strip()
+            if token.upper() == 'NULL':
+                row.append(None)
+            elif re.fullmatch(r'-?\d+', token):
+                row.append(int(token))
+            else:
+                # Bare identifiers such as E00001
+                row.append(token)
+            i = end
+    return rows
+
+
+def parse_column_names(text):
+    return [part.strip().strip('`"').split()[0] for part in text.split(',') if part.strip()]
+
+
+def iter_employee_rows(lines):
+    """Yield one dict per EMPLOYEE_DATA row, keyed by upper-case column name"""
+    columns = DEFAULT_COLUMNS
+    for statement in iter_statements(lines):
+        create = CREATE_PREFIX.match(statement)
+        if create:
+            # Drop type arguments such as VARCHAR(50) before splitting on commas
+            body = re.sub(r'\([^)]*\)', '', statement[create.end():statement.rfind(')')])
+            columns = [name for name in parse_column_names(body) if name.upper() not in ('PRIMARY', 'FOREIGN')]
+            continue
+
+        insert = INSERT_PREFIX.match(statement)
+        if not insert:
+            continue
+        row_columns = parse_column_names(insert.group(2)) if insert.group(2) else columns
+        names = [name.upper() for name in row_columns]
+        for values in parse_values(statement[insert.end():]):
+            yield dict(zip(names, values))
+
+
+def normalize_time(value):
+    """'09:00:00' -> '09:00'; NULL stays None"""
+    if value is None:
+        return None
+    parts = str(value).split(':')
+    return ':'.join(parts[:2]) if len(parts) >= 2 else str(value)
+
+
+def normalize_row(row):
+    """Split an EMPLOYEE_DATA row into employee, skill and shift rows"""
+    employee_id = str(row['EMPLOYEE_ID'])
+    skills = []
+    for i in range(1, 6):
+        skill = row.get(f"SKILL_{i}")
+        score = row.get(f"SKILL_{i}_SCORE")
+        if skill is not None and score is not None:
+            skills.append((employee_id, skill, int(score)))
+
+    shifts = []
+    for day in DAYS:
+        shift_in = normalize_time(row.get(f"{day.upper()}_STARTING_TIME"))
+        shift_out = normalize_time(row.get(f"{day.upper()}_ENDING_TIME"))
+        if shift_in is not None and shift_out is not None:
+            shifts.append((employee_id, day, shift_in, shift_out))
+
+    return employee_id, skills, shifts
+
+
+def import_employees(lines, conn, replace=True):
+    """Stream EMPLOYEE_DATA rows into the employee tables in a single transaction"""
+    create_employee_tables(conn)
+    counts = {'employees': 0, 'skills': 0, 'shifts': 0}
+    employees, skills, shifts = [], [], []
+
+    def flush():
+        conn.executemany('INSERT OR REPLACE INTO employees (employee_id) VALUES (?)', employees)
+        conn.executemany('DELETE FROM employee_skills WHERE employee_id = ?', employees)
+        conn.executemany('DELETE FROM employee_shifts WHERE employee_id = ?', employees)
+        conn.executemany(
+            'INSERT OR REPLACE INTO employee_skills (employee_id, skill, proficiency) VALUES (?, ?, ?)', skills)
+        conn.executemany(
+            'INSERT OR REPLACE INTO employee_shifts (employee_id, day, shift_in, shift_out) VALUES (?, ?, ?, ?)', shifts)
+        counts['employees'] += len(employees)
+        counts['skills'] += len(skills)
+        counts['shifts'] += len(shifts)
+        employees.clear()
+        skills.clear()
+        shifts.clear()
+
+    with conn:
+        if replace:
+            conn.execute('DELETE FROM employee_skills')
+            conn.execute('DELETE FROM employee_shifts')
+            conn.execute('DELETE FROM employees')
+
+        for row in iter_employee_rows(lines):
+            employee_id, employee_skills, employee_shifts = normalize_row(row)
+            employees.append((employee_id,))
+            skills.extend(employee_skills)
+            shifts.extend(employee_shifts)
+            if len(employees) >= BATCH_SIZE:
+                flush()
+        flush()
+
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('dump', help='SQL file with EMPLOYEE_DATA inserts')
+    parser.add_argument('--db', default='tasks.db', help='SQLite database to import into')
+    parser.add_argument('--append', action='store_true',
+                        help='update employees in the dump and keep everyone else')
+    parser.add_argument('--snapshot', default='employees.snapshot',
+                        help="allocator employee snapshot to rewrite after the import ('' to skip)")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    conn = sqlite3.connect(args.db)
+    try:
+        with open(args.dump, encoding='utf-8') as f:
+            counts = import_employees(f, conn, replace=not args.append)
+    finally:
+        conn.close()
+
+    print(f"Imported {counts['employees']} employees, {counts['skills']} skills and "
+          f"{counts['shifts']} shifts into {args.db} in {time.perf_counter() - started:.2f}s")
+
+    if args.snapshot:
+        # Loaded only when needed; the snapshot module pulls in the allocator
+        from employee_snapshot import write_snapshot
+        from TASK_ALLOCATOR import load_employees_from_db
+        version = write_snapshot(load_employees_from_db(args.db), args.snapshot)
+        print(f"Rewrote {args.snapshot} (version {version[:12]}); running servers pick it up on "
+              f"POST /api/employees/reload or their next allocation")
+
+
+if __name__ == '__main__':
+    main()
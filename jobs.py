@@ -0,0 +1,210 @@
+import json
+import os
+import sqlite3
+import threading
+import traceback
+from datetime import datetime
+
+# How often idle workers look for jobs queued by other processes
+POLL_INTERVAL_SECONDS = 1.0
+
+# Longest a worker waits before retrying after a database error, e.g. a lock held past busy_timeout
+MAX_BACKOFF_SECONDS = 30.0
+
+
+def _now():
+    return datetime.now().isoformat(timespec='seconds')
+
+
+def _process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class JobQueue:
+    """Background jobs persisted in a SQLite jobs table and run by a local worker pool.
+
+    Jobs are claimed with a conditional UPDATE, so several server processes
+    can share one table. Jobs left 'running' by a process that no longer
+    exists are queued again on start, which lets them survive a restart.
+    """
+
+    def __init__(self, pool, workers=2):
+        self.pool = pool
+        self.workers = workers
+        self.handlers = {}
+        self._wakeup = threading.Condition()
+        self._threads = []
+        self._stopping = False
+
+        with self.pool.connection() as conn:
+            conn.execute('''
+            CREATE TABLE IF NOT EXISTS jobs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                kind TEXT NOT NULL,
+                payload TEXT,
+                status TEXT NOT NULL DEFAULT 'queued',
+                progress REAL NOT NULL DEFAULT 0,
+                result TEXT,
+                error TEXT,
+                worker_pid INTEGER,
+                created_at TEXT,
+                updated_at TEXT
+            )
+            ''')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status, id)')
+            conn.commit()
+
+    def register(self, kind, handler):
+        """handler(payload, progress) returns a JSON-serializable result"""
+        self.handlers[kind] = handler
+
+    def start(self):
+        self._requeue_orphans()
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._run, name=f"job-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        return self
+
+    def stop(self):
+        self._stopping = True
+        with self._wakeup:
+            self._wakeup.notify_all()
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+
+    def _requeue_orphans(self):
+        with self.pool.connection() as conn:
+            running = conn.execute(
+                "SELECT id, worker_pid FROM jobs WHERE status = 'running'"
+            ).fetchall()
+            orphaned = [(job_id,) for job_id, pid in running
+                        if pid is None or pid == os.getpid() or not _process_alive(pid)]
+            conn.executemany(
+                "UPDATE jobs SET status = 'queued', worker_pid = NULL, progress = 0 WHERE id = ?",
+                orphaned
+            )
+            conn.commit()
+        if orphaned:
+            print(f"Requeued {len(orphaned)} interrupted job(s)")
+
+    def submit(self, kind, payload):
+        if kind not in self.handlers:
+            raise ValueError(f"Unknown job kind: {kind}")
+        with self.pool.connection() as conn:
+            cursor = conn.execute(
+                'INSERT INTO jobs (kind, payload, created_at, updated_at) VALUES (?, ?, ?, ?)',
+                (kind, json.dumps(payload), _now(), _now())
+            )
+            conn.commit()
+            job_id = cursor.lastrowid
+        with self._wakeup:
+            self._wakeup.notify()
+        return job_id
+
+    def get(self, job_id):
+        with self.pool.connection() as conn:
+            row = conn.execute(
+                'SELECT id, kind, status, progress, result, error, created_at, updated_at '
+                'FROM jobs WHERE id = ?',
+                (job_id,)
+            ).fetchone()
+        if not row:
+            return None
+        return {
+            'id': row[0],
+            'kind': row[1],
+            'status': row[2],
+            'progress': row[3],
+            'result': json.loads(row[4]) if row[4] else None,
+            'error': row[5],
+            'createdAt': row[6],
+            'updatedAt': row[7]
+        }
+
+    def _claim(self, conn):
+        while True:
+            row = conn.execute(
+                "SELECT id, kind, payload FROM jobs WHERE status = 'queued' ORDER BY id LIMIT 1"
+            ).fetchone()
+            if not row:
+                return None
+            cursor = conn.execute(
+                "UPDATE jobs SET status = 'running', worker_pid = ?, updated_at = ? "
+                "WHERE id = ? AND status = 'queued'",
+                (os.getpid(), _now(), row[0])
+            )
+            conn.commit()
+            # Another worker may have claimed it between the SELECT and the UPDATE
+            if cursor.rowcount == 1:
+                return row
+
+    def _update(self, job_id, **columns):
+        columns['updated_at'] = _now()
+        assignments = ', '.join(f"{name} = ?" for name in columns)
+        with self.pool.connection() as conn:
+            conn.execute(f"UPDATE jobs SET {assignments} WHERE id = ?", (*columns.values(), job_id))
+            conn.commit()
+
+    def _wait(self, seconds):
+        with self._wakeup:
+            self._wakeup.wait(seconds)
+
+    def _backoff(self, attempt):
+        """Seconds to wait after attempt consecutive database errors"""
+        return min(POLL_INTERVAL_SECONDS * 2 ** attempt, MAX_BACKOFF_SECONDS)
+
+    def _finish(self, job_id, **columns):
+        """Record a job's outcome, retrying database errors so it isn't left 'running'"""
+        attempt = 0
+        while True:
+            try:
+                self._update(job_id, **columns)
+                return
+            except sqlite3.Error as e:
+                if self._stopping:
+                    # Requeued as an orphan when the server starts again
+                    return
+                print(f"Could not record the outcome of job {job_id}, retrying: {e}")
+                self._wait(self._backoff(attempt))
+                attempt += 1
+
+    def _run(self):
+        errors = 0
+        while not self._stopping:
+            try:
+                with self.pool.connection() as conn:
+                    job = self._claim(conn)
+            except sqlite3.Error as e:
+                print(f"Could not claim a job, retrying: {e}")
+                self._wait(self._backoff(errors))
+                errors += 1
+                continue
+            errors = 0
+            if job is None:
+                self._wait(POLL_INTERVAL_SECONDS)
+                continue
+
+            job_id, kind, payload = job
+
+            def progress(fraction, job_id=job_id):
+                # Progress is informational; a locked database shouldn't fail the job
+                try:
+                    self._update(job_id, progress=round(float(fraction), 4))
+                except sqlite3.Error as e:
+                    print(f"Could not record progress of job {job_id}: {e}")
+
+            try:
+                result = json.dumps(self.handlers[kind](json.loads(payload) if payload else None, progress))
+            except Exception as e:
+                traceback.print_exc()
+                self._finish(job_id, status='failed', error=str(e))
+            else:
+                self._finish(job_id, status='done', progress=1.0, result=result)
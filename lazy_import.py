@@ -0,0 +1,31 @@
+"""Defer heavy imports until the first time they are used."""
+import importlib
+import threading
+
+
+class LazyImport:
+    """Stands in for a module and imports it on first attribute access.
+
+        np = LazyImport('numpy')
+        np.zeros(3)  # numpy is imported here, not at module import time
+    """
+
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+        self._lock = threading.Lock()
+
+    # Only underscore names live on the proxy, so every public name reaches the module
+    def _load(self):
+        if self._module is None:
+            with self._lock:
+                if self._module is None:
+                    self._module = importlib.import_module(self._name)
+        return self._module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __repr__(self):
+        state = 'not loaded' if self._module is None else 'loaded'
+        return f"<LazyImport {self._name!r} ({state})>"
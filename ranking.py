@@ -0,0 +1,68 @@
+"""Score candidates once and keep the best k with a bounded heap."""
+import heapq
+
+from lazy_import import LazyImport
+
+np = LazyImport('numpy')
+
+# Feature weights per scoring profile; every feature is scaled to 0..1
+PROFILES = {
+    'proficiency': {'proficiency': 1.0},
+    'hours': {'hours': 1.0, 'proficiency': 0.25},
+    'workload': {'workload': 1.0, 'proficiency': 0.5},
+    'deadline': {'deadline': 1.0, 'proficiency': 0.5},
+    'balanced': {'proficiency': 0.4, 'hours': 0.2, 'workload': 0.25, 'deadline': 0.15},
+}
+
+DEFAULT_PROFILE = 'proficiency'
+
+# Candidates the API and background jobs keep per task; global assignment looks at up to 25
+DEFAULT_TOP_K = 25
+
+MAX_PROFICIENCY = 10
+
+
+def candidate_features(skill_sum, available_hours, required_count, task_hours, open_tasks, urgency):
+    """Scale the raw numbers for one employee and task to 0..1"""
+    coverage = min(1.0, available_hours / task_hours) if task_hours else 0.0
+    return {
+        'proficiency': skill_sum / (MAX_PROFICIENCY * required_count) if required_count else 0.0,
+        'hours': coverage,
+        'workload': 1.0 / (1 + open_tasks),
+        # Tasks due soon reward covering their whole window more
+        'deadline': coverage * urgency
+    }
+
+
+def candidate_feature_arrays(skill_sums, available_hours, required_counts, task_hours, open_tasks, urgency):
+    """candidate_features for arrays of task-employee pairs; the arguments broadcast together"""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        coverage = np.where(task_hours > 0, np.minimum(1.0, available_hours / task_hours), 0.0)
+    return {
+        'proficiency': skill_sums / (MAX_PROFICIENCY * required_counts),
+        'hours': coverage,
+        'workload': 1.0 / (1 + open_tasks),
+        'deadline': coverage * urgency
+    }
+
+
+def task_urgency(time_windows):
+    """1.0 for a task that fits in one day, falling off as its window spans more days"""
+    return 1.0 / max(1, len(time_windows))
+
+
+def scorer(profile=DEFAULT_PROFILE):
+    """Scoring function for a profile name, weights dict or callable taking the features dict"""
+    if callable(profile):
+        return profile
+    weights = PROFILES.get(profile) if isinstance(profile, str) else profile
+    if not weights:
+        raise ValueError(f"Unknown scoring profile {profile!r}; expected one of {', '.join(PROFILES)}")
+    return lambda features: sum(weight * features.get(name, 0.0) for name, weight in weights.items())
+
+
+def top_k(items, k, key):
+    """The k largest items by key in O(n log k); every item, sorted, when k is None"""
+    if k is None:
+        return sorted(items, key=key, reverse=True)
+    return heapq.nlargest(k, items, key=key)
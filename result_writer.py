@@ -0,0 +1,59 @@
+"""Write allocation results one task at a time instead of one big JSON dump."""
+import json
+
+FORMATS = ('json', 'ndjson')
+
+
+def compact_result(result):
+    """Task result with employees referred to by id; skills and shifts stay in the employee data"""
+    compact = {key: value for key, value in result.items()
+               if key not in ('matching_employees', 'best_candidates')}
+    compact['matching_employees'] = [
+        {
+            'employee_id': emp['employee_id'],
+            'matched_skills': emp['matched_skills'],
+            'availability': emp['availability'],
+            'score': emp['score']
+        }
+        for emp in result['matching_employees']
+    ]
+    compact['best_candidates'] = [emp['employee_id'] for emp in result['best_candidates']]
+    return compact
+
+
+class ResultWriter:
+    """Stream records to a file as they are produced.
+
+    'ndjson' writes one JSON object per line; 'json' writes a compact JSON
+    array with one record per line, so either format can be read back
+    without holding the whole run in memory while writing.
+    """
+
+    def __init__(self, path, format='json'):
+        if format not in FORMATS:
+            raise ValueError(f"Unknown output format {format!r}; expected one of {', '.join(FORMATS)}")
+        self.path = path
+        self.format = format
+        self.count = 0
+        self._file = None
+
+    def __enter__(self):
+        self._file = open(self.path, 'w')
+        if self.format == 'json':
+            self._file.write('[')
+        return self
+
+    def write(self, record):
+        if self.format == 'json':
+            self._file.write(',\n' if self.count else '\n')
+        json.dump(record, self._file, separators=(',', ':'))
+        if self.format == 'ndjson':
+            self._file.write('\n')
+        self.count += 1
+
+    def __exit__(self, *exc):
+        if self.format == 'json':
+            self._file.write('\n]\n')
+        self._file.close()
+        self._file = None
+        return False
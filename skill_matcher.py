@@ -0,0 +1,66 @@
+"""Cheap lexical matching of free-text skills, tried before the embedding model."""
+import re
+
+# Dice similarity of character trigrams needed for a lexical match
+LEXICAL_THRESHOLD = 0.7
+
+_SEPARATORS = re.compile(r'[\s\-_/.]+')
+
+
+def canonical(text):
+    """Lowercase with hyphens, underscores and runs of spaces folded to one space"""
+    return _SEPARATORS.sub(' ', str(text).lower()).strip()
+
+
+def trigrams(text):
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class LexicalIndex:
+    """Exact and trigram lookups against a fixed skill list.
+
+    lookup() returns (skill, similarity, tier) with tier 'exact' or
+    'lexical', or None when the text should go to the embedding model.
+    """
+
+    def __init__(self, skills, threshold=LEXICAL_THRESHOLD):
+        self.skills = list(skills)
+        self.threshold = threshold
+        self.exact = {}
+        self.grams = []
+        self.postings = {}
+        for index, skill in enumerate(self.skills):
+            key = canonical(skill)
+            # "PLC Programming", "plc-programming" and "PLCProgramming" all hit
+            self.exact.setdefault(key, index)
+            self.exact.setdefault(key.replace(' ', ''), index)
+            grams = trigrams(key)
+            self.grams.append(grams)
+            for gram in grams:
+                self.postings.setdefault(gram, []).append(index)
+
+    def lookup(self, text):
+        key = canonical(text)
+        if not key:
+            return None
+        index = self.exact.get(key)
+        if index is None:
+            index = self.exact.get(key.replace(' ', ''))
+        if index is not None:
+            return self.skills[index], 1.0, 'exact'
+
+        # Count shared trigrams only for skills that share at least one
+        grams = trigrams(key)
+        shared = {}
+        for gram in grams:
+            for index in self.postings.get(gram, ()):
+                shared[index] = shared.get(index, 0) + 1
+        best_index, best_score = None, 0.0
+        for index, count in shared.items():
+            score = 2 * count / (len(grams) + len(self.grams[index]))
+            if score > best_score:
+                best_index, best_score = index, score
+        if best_index is not None and best_score >= self.threshold:
+            return self.skills[best_index], round(best_score, 4), 'lexical'
+        return None
@@ -0,0 +1,122 @@
+"""Which stored allocations refresh_allocations recomputes."""
+import json
+import os
+import sqlite3
+import sys
+from datetime import datetime
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [ROOT, os.path.join(ROOT, 'benchmarks')]
+
+from allocation_state import create_state_tables, refresh_allocations, save_allocation
+from ranking import DEFAULT_TOP_K
+from synthetic import HashingEncoder
+from TASK_ALLOCATOR import DAYS, AllocatorEngine, load_workload, task_from_api
+
+MONDAY = datetime(2026, 10, 19, 9, 0)
+WEDNESDAY = datetime(2026, 10, 21, 9, 0)
+
+WEEKDAY_SHIFTS = {f"{day}_{edge}": hours for day in DAYS[:5] for edge, hours in (('in', '08:00'), ('out', '16:00'))}
+
+EMPLOYEES = [
+    {'employee_id': 'A', 'skills': {'Welding': 9, 'Electrical': 5}, 'shifts': WEEKDAY_SHIFTS},
+    {'employee_id': 'B', 'skills': {'Welding': 6}, 'shifts': WEEKDAY_SHIFTS},
+    {'employee_id': 'C', 'skills': {'Carpentry': 8}, 'shifts': WEEKDAY_SHIFTS},
+]
+
+WELD = {'id': 1, 'title': 'Weld frame', 'skills': ['Welding'], 'deadline': '2026-10-22'}
+
+
+@pytest.fixture
+def engine(tmp_path):
+    path = tmp_path / 'employees_data.json'
+    path.write_text(json.dumps(EMPLOYEES))
+    return AllocatorEngine(employees_file=str(path), model=HashingEncoder(),
+                           cache_dir=str(tmp_path / 'cache')).warm_up()
+
+
+@pytest.fixture
+def conn():
+    conn = sqlite3.connect(':memory:')
+    conn.execute('CREATE TABLE tasks (id INTEGER PRIMARY KEY, project_id INTEGER, title TEXT, skills TEXT, '
+                 'deadline TEXT, hours REAL, assigned_to TEXT)')
+    create_state_tables(conn)
+    yield conn
+    conn.close()
+
+
+def allocate(conn, engine, task, now):
+    """What the allocate_task job does for a new or edited task"""
+    result = engine.allocate(task_from_api(task, now), k=DEFAULT_TOP_K, **load_workload(conn, now)) or {}
+    save_allocation(conn, task, result, now)
+    conn.commit()
+    return result
+
+
+def best(result):
+    return [candidate['employee_id'] for candidate in result['best_candidates']]
+
+
+def test_unchanged_allocations_are_kept(conn, engine):
+    allocate(conn, engine, WELD, MONDAY)
+    refresh_allocations(conn, engine, [WELD], now=MONDAY)
+
+    assert refresh_allocations(conn, engine, [WELD], now=MONDAY)['recomputed'] == []
+
+
+def test_edited_task_is_recomputed(conn, engine):
+    allocate(conn, engine, WELD, MONDAY)
+    refresh_allocations(conn, engine, [WELD], now=MONDAY)
+
+    edited = {**WELD, 'deadline': '2026-10-23'}
+    assert refresh_allocations(conn, engine, [edited], now=MONDAY)['recomputed'] == [1]
+
+
+def test_allocations_from_an_earlier_day_are_recomputed(conn, engine, tmp_path):
+    # A starts work on Wednesday, so a Monday allocation can't count on them
+    late_week = {key: hours for key, hours in WEEKDAY_SHIFTS.items() if key.split('_')[0] in DAYS[2:5]}
+    (tmp_path / 'employees_data.json').write_text(json.dumps([{**EMPLOYEES[0], 'shifts': late_week}, *EMPLOYEES[1:]]))
+    engine.reload_employees()
+    refresh_allocations(conn, engine, [WELD], now=MONDAY)
+    stored = json.loads(conn.execute('SELECT result FROM task_allocations WHERE task_id = 1').fetchone()[0])
+    assert stored['best_candidates'] == ['B']
+
+    refreshed = refresh_allocations(conn, engine, [WELD], now=WEDNESDAY)
+
+    assert refreshed['recomputed'] == [1]
+    assert refreshed['changed'][0]['best_candidates'] == ['A', 'B']
+
+
+def test_expired_assignments_free_their_assignee(conn, engine):
+    # A is booked until Tuesday, so on Monday only B is available
+    conn.execute("INSERT INTO tasks (title, deadline, hours, assigned_to) VALUES ('Pipework', '2026-10-20', 100, 'A')")
+    assert best(allocate(conn, engine, WELD, MONDAY)) == ['B']
+    assert refresh_allocations(conn, engine, [WELD], now=MONDAY)['changed'] == []
+
+    refreshed = refresh_allocations(conn, engine, [WELD], now=WEDNESDAY)
+
+    assert refreshed['recomputed'] == [1]
+    assert refreshed['changed'][0]['best_candidates'] == ['A', 'B']
+    stored = json.loads(conn.execute('SELECT result FROM task_allocations WHERE task_id = 1').fetchone()[0])
+    assert stored['best_candidates'] == ['A', 'B']
+
+
+def test_employee_changes_recompute_tasks_needing_their_skills(conn, engine, tmp_path):
+    electrical = {'id': 2, 'title': 'Rewire panel', 'skills': ['Electrical'], 'deadline': '2026-10-22'}
+    refresh_allocations(conn, engine, [WELD, electrical], now=MONDAY)
+
+    # B's welding changes; nobody's electrical does
+    changed = [EMPLOYEES[0], {**EMPLOYEES[1], 'skills': {'Welding': 3}}, EMPLOYEES[2]]
+    (tmp_path / 'employees_data.json').write_text(json.dumps(changed))
+    engine.reload_employees()
+
+    assert refresh_allocations(conn, engine, [WELD, electrical], now=MONDAY)['recomputed'] == [1]
+
+
+def test_workload_changes_recompute_tasks_of_the_assignee(conn, engine):
+    refresh_allocations(conn, engine, [WELD], now=MONDAY)
+    conn.execute("INSERT INTO tasks (title, deadline, hours, assigned_to) VALUES ('Pipework', '2026-10-23', 4, 'B')")
+
+    assert refresh_allocations(conn, engine, [WELD], now=MONDAY)['recomputed'] == [1]
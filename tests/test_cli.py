@@ -0,0 +1,64 @@
+"""TASK_ALLOCATOR.py run from the command line against a project in tasks.db."""
+import json
+import os
+import random
+import sqlite3
+import sys
+import types
+from datetime import datetime, timedelta
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [ROOT, os.path.join(ROOT, 'benchmarks')]
+
+import TASK_ALLOCATOR
+from synthetic import HashingEncoder, generate_employee_rows, rows_to_employees
+
+
+@pytest.fixture
+def project_db(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(TASK_ALLOCATOR, 'sentence_transformers',
+                        types.SimpleNamespace(SentenceTransformer=lambda name: HashingEncoder()))
+
+    employees = rows_to_employees(generate_employee_rows(50, random.Random(3)))
+    with open('employees_data.json', 'w') as f:
+        json.dump(employees, f)
+
+    deadline = (datetime.now() + timedelta(days=3)).strftime('%Y-%m-%d')
+    conn = sqlite3.connect('tasks.db')
+    conn.execute('CREATE TABLE tasks (id INTEGER PRIMARY KEY, project_id INTEGER, title TEXT, skills TEXT, '
+                 'deadline TEXT, hours REAL, assigned_to INTEGER)')
+    conn.executemany('INSERT INTO tasks (project_id, title, skills, deadline) VALUES (?, ?, ?, ?)', [
+        (1, 'Weld frame', json.dumps(['Welding']), deadline),
+        (1, 'Bad deadline', json.dumps(['Welding']), '2026-13-45'),
+        (1, 'No deadline', json.dumps(['Electrical']), None),
+        (2, 'Other project', json.dumps(['Welding']), deadline),
+    ])
+    conn.commit()
+    conn.close()
+    return tmp_path
+
+
+def written(path, pattern):
+    [name] = [name for name in os.listdir(path) if name.startswith(pattern)]
+    with open(path / name) as f:
+        return json.load(f)
+
+
+def test_project_skips_unparseable_deadlines(project_db, capsys):
+    TASK_ALLOCATOR.main(['--project', '1'])
+
+    output = capsys.readouterr().out
+    assert "Skipping task 2: deadline '2026-13-45' is not YYYY-MM-DD" in output
+    assert 'Allocated 2/2 tasks' in output
+    assert [result['task_id'] for result in written(project_db, 'task_allocations_')] == [1, 3]
+    assert {entry['task_id'] for entry in written(project_db, 'top_candidates_')} <= {1, 3}
+
+
+def test_project_without_unassigned_tasks(project_db, capsys):
+    TASK_ALLOCATOR.main(['--project', '3'])
+
+    assert 'No unassigned tasks found for project 3' in capsys.readouterr().out
+    assert not [name for name in os.listdir(project_db) if name.startswith('task_allocations_')]
@@ -0,0 +1,72 @@
+"""Background job workers keep running through database errors."""
+import os
+import sqlite3
+import sys
+import time
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import jobs
+from db import ConnectionPool
+from jobs import JobQueue
+
+
+@pytest.fixture
+def queue(tmp_path, monkeypatch):
+    monkeypatch.setattr(jobs, 'POLL_INTERVAL_SECONDS', 0.01)
+    queue = JobQueue(ConnectionPool(str(tmp_path / 'tasks.db')), workers=1)
+    queue.register('double', lambda payload, progress: payload * 2)
+    yield queue
+    queue.stop()
+
+
+def failing(method, times):
+    """method, raising 'database is locked' on its first times calls"""
+    calls = []
+
+    def wrapper(*args, **kwargs):
+        calls.append(args)
+        if len(calls) <= times:
+            raise sqlite3.OperationalError('database is locked')
+        return method(*args, **kwargs)
+    return wrapper
+
+
+def wait_for(queue, job_id, timeout=5):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = queue.get(job_id)
+        if job['status'] in ('done', 'failed'):
+            return job
+        time.sleep(0.01)
+    return queue.get(job_id)
+
+
+def test_claim_errors_do_not_stop_workers(queue):
+    queue._claim = failing(queue._claim, 3)
+    queue.start()
+
+    job = wait_for(queue, queue.submit('double', 21))
+    assert job['status'] == 'done'
+    assert job['result'] == 42
+
+
+def test_outcome_is_recorded_after_errors(queue):
+    update = queue._update
+
+    def locked_outcome(job_id, **columns):
+        if 'status' in columns and not locked_outcome.failed:
+            locked_outcome.failed = True
+            raise sqlite3.OperationalError('database is locked')
+        update(job_id, **columns)
+    locked_outcome.failed = False
+    queue._update = locked_outcome
+    queue.start()
+
+    job = wait_for(queue, queue.submit('double', 4))
+    assert locked_outcome.failed
+    assert job['status'] == 'done'
+    assert job['result'] == 8
@@ -0,0 +1,93 @@
+"""Skill scarcity uses the skills the allocator resolved, whatever the wording."""
+import json
+import os
+import sqlite3
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from allocation_state import create_state_tables, save_allocation
+from TASK_PRIORITISER import PriorityEngine, create_priority_tables, skill_scarcity
+
+# 1000 employees; HVAC is rare, welding common
+SKILL_COUNTS = {'HVAC': 3, 'Welding': 600}
+TOTAL = 1000
+
+
+def test_exact_skill_names_are_scored_without_an_allocation():
+    assert skill_scarcity(['HVAC'], SKILL_COUNTS, TOTAL) == pytest.approx(0.997)
+    assert skill_scarcity(['welding'], SKILL_COUNTS, TOTAL) == pytest.approx(0.4)
+
+
+def test_rewording_keeps_the_resolved_skills_scarcity():
+    for wording in (['hvac repair'], ['air conditioning']):
+        assert skill_scarcity(wording, SKILL_COUNTS, TOTAL, required_skills=['HVAC']) == pytest.approx(0.997)
+
+
+def test_unresolved_skills_are_scarce():
+    assert skill_scarcity(['underwater welding'], SKILL_COUNTS, TOTAL) == 1.0
+    assert skill_scarcity(['underwater welding'], SKILL_COUNTS, TOTAL, required_skills=[]) == 1.0
+    assert skill_scarcity(['Welding', 'underwater welding'], SKILL_COUNTS, TOTAL,
+                          required_skills=['Welding']) == 1.0
+
+
+class Workforce:
+    skill_index = {skill: [None] * count for skill, count in SKILL_COUNTS.items()}
+
+    def __len__(self):
+        return TOTAL
+
+
+@pytest.fixture
+def conn():
+    conn = sqlite3.connect(':memory:')
+    conn.execute('CREATE TABLE projects (id INTEGER PRIMARY KEY, name TEXT)')
+    conn.execute('CREATE TABLE tasks (id INTEGER PRIMARY KEY, project_id INTEGER, title TEXT, description TEXT, '
+                 'skills TEXT, deadline TEXT, hours REAL, assigned_to TEXT)')
+    create_state_tables(conn)
+    create_priority_tables(conn)
+    conn.execute("INSERT INTO tasks (project_id, title, skills) VALUES (1, 'Fix the chiller', ?)",
+                 (json.dumps(['air conditioning']),))
+    conn.commit()
+    yield conn
+    conn.close()
+
+
+def allocate(conn):
+    """Store the allocator's result: 'air conditioning' resolved to HVAC by the embedding tier"""
+    save_allocation(conn, {'id': 1, 'skills': ['air conditioning']},
+                    {'task_id': 1, 'required_skills': ['HVAC'], 'matching_employees': [], 'best_candidates': []})
+    conn.commit()
+
+
+def scarcity(engine, conn):
+    [task] = engine.ranked(conn, 1)
+    return task['priority']['factors']['scarcity']
+
+
+def test_queue_picks_up_resolved_skills(conn):
+    engine = PriorityEngine()
+    engine.set_workforce(Workforce())
+    assert scarcity(engine, conn) == 1.0
+
+    allocate(conn)
+    engine.task_changed(conn, 1)
+
+    assert scarcity(engine, conn) == 0.997
+    # Another process building its queue from the database sees the same
+    other = PriorityEngine()
+    other.set_workforce(Workforce())
+    assert scarcity(other, conn) == 0.997
+
+
+def test_allocation_saved_elsewhere_rebuilds_the_queue(conn):
+    engine = PriorityEngine()
+    engine.set_workforce(Workforce())
+    assert scarcity(engine, conn) == 1.0
+
+    allocate(conn)
+
+    assert scarcity(engine, conn) == 0.997
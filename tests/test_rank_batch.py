@@ -0,0 +1,65 @@
+"""rank_batch must return exactly what rank_task returns, ties included."""
+import os
+import random
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [ROOT, os.path.join(ROOT, 'benchmarks')]
+
+from employee_snapshot import SnapshotIndex, write_snapshot
+from ranking import PROFILES
+from synthetic import HashingEncoder, generate_employee_rows, generate_tasks, rows_to_employees
+from TASK_ALLOCATOR import EmployeeIndex, _normalize_rows, match_skills_batch, rank_batch, rank_task, skillset
+
+
+@pytest.fixture(scope='module')
+def workforce():
+    rng = random.Random(7)
+    employees = rows_to_employees(generate_employee_rows(400, rng))
+    tasks = generate_tasks(30, rng, span_days=3)
+    model = HashingEncoder()
+    matched = match_skills_batch([task['skillsRequired'] for task in tasks], model,
+                                 _normalize_rows(model.encode(skillset)))
+    busy = rng.sample([employee['employee_id'] for employee in employees], 120)
+    workload = {
+        'workload': {str(employee_id): rng.randint(1, 4) for employee_id in busy},
+        'committed_hours': {str(employee_id): rng.choice([2, 8, 40]) for employee_id in busy}
+    }
+    return employees, list(zip(tasks, matched)), workload
+
+
+def indexes(employees, tmp_path):
+    path = str(tmp_path / 'employees.snapshot')
+    write_snapshot(employees, path)
+    return {'memory': EmployeeIndex(employees), 'snapshot': SnapshotIndex(path)}
+
+
+def assert_same(pairs, index, **ranking):
+    expected = [rank_task(task, matched, index, **ranking) for task, matched in pairs]
+    actual = list(rank_batch(pairs, index, **ranking))
+    assert actual == expected
+
+
+@pytest.mark.parametrize('profile', list(PROFILES))
+@pytest.mark.parametrize('k', [None, 1, 5])
+@pytest.mark.parametrize('with_workload', [False, True])
+def test_matches_rank_task(workforce, tmp_path, profile, k, with_workload):
+    employees, pairs, workload = workforce
+    ranking = {'k': k, 'profile': profile, **(workload if with_workload else {})}
+    for index in indexes(employees, tmp_path).values():
+        assert_same(pairs, index, **ranking)
+
+
+def test_integer_employee_ids(workforce):
+    employees, pairs, workload = workforce
+    numbered = [{**employee, 'employee_id': row + 1} for row, employee in enumerate(employees)]
+    committed = {str(row + 1): 500 for row in range(0, len(numbered), 3)}
+    assert_same(pairs, EmployeeIndex(numbered), k=10, profile='balanced', committed_hours=committed,
+                workload=workload['workload'])
+
+
+def test_callable_profile(workforce):
+    employees, pairs, _ = workforce
+    assert_same(pairs, EmployeeIndex(employees), k=5, profile=lambda features: features['hours'])